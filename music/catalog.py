@@ -0,0 +1,179 @@
+"""Binary catalog files of songs and playlists, with random access to individual songs and playlists.
+Unlike text files (__str__()/from_str()), JSON and pickle, a catalog file does not have to be read (deserialized)
+entirely to get one song or playlist from it: the file is memory-mapped (mmap), and the offsets of all records
+are stored in an index at the end of the file, so getting song N or playlist K costs the same regardless of
+the size of the file, and opening the file only reads its header.
+
+File format (all integers are little-endian):
+- header: b'MCAT', format version (uint16), number of songs (uint32), number of playlists (uint32),
+          offset of the song index (uint64), offset of the playlist index (uint64)
+- song records: class code (uint8), is_unplugged (uint8), tempo code (uint8), instrument code (uint8),
+                title length in bytes (uint32), title (UTF-8)
+- playlist records: created and completed dates as ordinals (uint32, uint32), name length in bytes (uint32),
+                    number of songs (uint32), name (UTF-8), song numbers (uint32 each)
+- song index: offsets of the song records (uint64 each)
+- playlist index: offsets of the playlist records (uint64 each)
+The codes are those of SongTable.song_to_codes(): the positions in SongTable.song_classes, SongTable.all_tempos
+and SongTable.all_instruments (tempo and instrument codes are position + 1, and 0 if the song has no tempo/instrument).
+Identical songs are stored only once, and playlists refer to them by their numbers.
+"""
+
+from datetime import date
+import mmap
+import os
+import struct
+
+from music.playlist import *
+from music.songtable import SongTable
+
+MAGIC = b'MCAT'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIQQ')
+SONG = struct.Struct('<BBBBI')
+PLAYLIST = struct.Struct('<IIII')
+OFFSET = struct.Struct('<Q')
+
+
+def song_to_bytes(song):
+    kind, title, is_unplugged, tempo, instrument = SongTable.song_to_codes(song)
+    title = title.encode('utf-8')
+    return SONG.pack(kind, is_unplugged, tempo, instrument, len(title)) + title
+
+
+def write_catalog(file, playlists=(), songs=()):
+    """Writes the songs and the playlists (and all their songs) to the catalog file (a Path object or a file name).
+    playlists and songs can be any iterables, including generators.
+    """
+
+    playlists = list(playlists)                         # iterated twice: for the songs, then for the records
+    song_numbers = {}                                   # (<class>, <data fields>) -> song number
+    song_offsets = []
+    playlist_offsets = []
+    with open(file, 'wb') as f:
+        f.write(bytes(HEADER.size))
+
+        def add_song(song):
+            key = (type(song), tuple(song.fields().items()))
+            if key not in song_numbers:
+                song_numbers[key] = len(song_offsets)
+                song_offsets.append(f.tell())
+                f.write(song_to_bytes(song))
+            return song_numbers[key]
+
+        for song in songs:
+            add_song(song)
+        numbers = [[add_song(song) for song in playlist.songs] for playlist in playlists]
+        for playlist, playlist_numbers in zip(playlists, numbers):
+            playlist_offsets.append(f.tell())
+            name = playlist.name.encode('utf-8')
+            f.write(PLAYLIST.pack(playlist.created.toordinal(), playlist.completed.toordinal(),
+                                  len(name), len(playlist_numbers)))
+            f.write(name)
+            f.write(struct.pack(f'<{len(playlist_numbers)}I', *playlist_numbers))
+
+        song_index = f.tell()
+        f.write(struct.pack(f'<{len(song_offsets)}Q', *song_offsets))
+        playlist_index = f.tell()
+        f.write(struct.pack(f'<{len(playlist_offsets)}Q', *playlist_offsets))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(song_offsets), len(playlist_offsets), song_index, playlist_index))
+
+
+class CatalogError(Exception):
+    """Exception raised when a file is not a catalog file (or it is of an unsupported version).
+    """
+
+    def __init__(self, file):
+        self.message = f'{file} is not a catalog file (version {VERSION})'
+
+
+class Catalog:
+    """The class representing an open catalog file (see write_catalog()), with random access
+    to its songs (song(n)) and playlists (playlist(k)); the records are decoded only when they are accessed.
+    Use it as a context manager (with Catalog(<file>) as c: ...), or call close() when it is not needed any more.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        with open(file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:  # too short for the header (an empty file cannot be mapped)
+                raise CatalogError(file)
+            self.__mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.n_songs, self.n_playlists, self.__song_index, self.__playlist_index = \
+            HEADER.unpack_from(self.__mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise CatalogError(file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.__mm.close()
+
+    def song(self, n):
+        """Returns song number n from the catalog.
+        """
+
+        if not 0 <= n < self.n_songs:
+            raise IndexError('song number out of range')
+        offset, = OFFSET.unpack_from(self.__mm, self.__song_index + n * OFFSET.size)
+        kind, is_unplugged, tempo, instrument, title_length = SONG.unpack_from(self.__mm, offset)
+        title_offset = offset + SONG.size
+        title = self.__mm[title_offset:title_offset + title_length].decode('utf-8')
+        return SongTable.song_from_codes(kind, title, is_unplugged, tempo, instrument)
+
+    def playlist(self, k):
+        """Returns playlist number k from the catalog, with all its songs.
+        """
+
+        if not 0 <= k < self.n_playlists:
+            raise IndexError('playlist number out of range')
+        offset, = OFFSET.unpack_from(self.__mm, self.__playlist_index + k * OFFSET.size)
+        created, completed, name_length, n_songs = PLAYLIST.unpack_from(self.__mm, offset)
+        name_offset = offset + PLAYLIST.size
+        name = self.__mm[name_offset:name_offset + name_length].decode('utf-8')
+        numbers = struct.unpack_from(f'<{n_songs}I', self.__mm, name_offset + name_length)
+        return Playlist(name, *[self.song(n) for n in numbers],
+                        created=date.fromordinal(created), completed=date.fromordinal(completed))
+
+
+if __name__ == "__main__":
+
+    from testdata.songs import *
+    from time import perf_counter
+
+    # Write and read a small catalog
+    pl = Playlist('My songs', *[across_the_universe, imagine, happiness_is_a_warm_gun, love],
+                  created=date(2020, 2, 13), completed=date.today())
+    ballads = Playlist('Ballads', Ballad(title='Right Before My Eyes', is_unplugged=True), imagine,
+                       PianoBallad(title='Jealous Guy', tempo=Tempo.MODERATE), created=date(2021, 3, 1))
+    file = get_data_dir() / 'songs.catalog'
+    write_catalog(file, [pl, ballads])
+    with Catalog(file) as c:
+        print(c.n_songs, c.n_playlists)
+        print(c.song(2))
+        print(c.playlist(1))
+        print(c.playlist(0) == pl, c.playlist(1) == ballads)
+    print()
+
+    # Compare getting one playlist from a large catalog file and from a pickle file
+    playlists = [Playlist(f'Playlist {k}', *[Song(f'Song {k * 100 + i}', i % 2 == 0) for i in range(100)],
+                          created=date(2020, 2, 13)) for k in range(10_000)]
+    write_catalog(file, playlists)
+    pickle_file = get_data_dir() / 'playlists.binary'
+    with open(pickle_file, 'wb') as f:
+        pickle.dump(playlists, f)
+    start = perf_counter()
+    with Catalog(file) as c:
+        p = c.playlist(9_999)
+    print(f'catalog: {(perf_counter() - start) * 1000:.1f} ms')
+    start = perf_counter()
+    with open(pickle_file, 'rb') as f:
+        p_pickled = pickle.load(f)[9_999]
+    print(f'pickle: {(perf_counter() - start) * 1000:.1f} ms')
+    print(p == p_pickled)
+    print()
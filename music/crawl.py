@@ -2,28 +2,94 @@
 BeautifulSoup documentation: https://www.crummy.com/software/BeautifulSoup/bs4/doc/
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from time import perf_counter
+from hashlib import sha1
+from pathlib import PurePosixPath
+from urllib.parse import urljoin, urlsplit
+import asyncio
+import importlib.util
+import json
+import re
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
 
 from util import utility
+from util.frontier import Frontier
 
 BASE_URL = 'https://www.imdb.com/'
+TIMEOUT = (5, 30)                   # (connect, read) timeouts in seconds
 
+FOUR_DIGITS = re.compile(r'\d{4}')
 
-def get_soup(url: str) -> BeautifulSoup:
+# The only tags of IMDb list pages needed for movie info (the 'h3' tags with titles, years and links,
+# and the 'div' tags with poster links); BeautifulSoup(..., parse_only=M_INFO_TAGS) skips everything else
+M_INFO_TAGS = SoupStrainer(['h3', 'div'], attrs={'class': ['lister-item-header', 'lister-item-image ribbonize']})
+
+# The fastest HTML parser available to BeautifulSoup, detected once without importing it (see get_fast_parser())
+FAST_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+
+def make_session(pool_connections=10, pool_maxsize=10, pool_block=False, session_class=requests.Session, **kwargs):
+    """Returns a requests.Session object with a pool of keep-alive connections.
+    Parameters:
+    - pool_connections: the number of hosts for which the connection pools are kept
+    - pool_maxsize: the max number of connections kept open per host
+    - pool_block: whether to wait for a free connection when pool_maxsize connections to a host are in use
+                  (otherwise, an extra connection is opened and discarded after use)
+    - session_class: requests.Session or its subclass, such as util.httpcache.CachedSession
+                     or util.ratelimit.ThrottledSession (kwargs are passed to its constructor)
+    All requests made through the same session reuse the open connections to the same host,
+    instead of opening a new TCP (and TLS) connection for each request, as requests.get() does.
+    """
+
+    session = session_class(**kwargs)
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# The session shared by get_soup(), get_next_soup(), crawl() and get_m_info() unless another one is passed to them
+session = make_session()
+
+
+def get_connection_stats(a_session=None):
+    """Returns a dictionary of connection reuse statistics for a session (the shared session by default),
+    as {<host>: {'requests': <n>, 'connections': <n>, 'reused': <n>}}, where 'reused' is the number of requests
+    that were sent over an already open connection.
+    """
+
+    stats = {}
+    adapter_list = set((a_session or session).adapters.values())
+    for adapter in adapter_list:
+        for key in adapter.poolmanager.pools.keys():
+            pool = adapter.poolmanager.pools[key]
+            stats[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                'requests': pool.num_requests,
+                'connections': pool.num_connections,
+                'reused': pool.num_requests - pool.num_connections}
+    return stats
+
+
+def get_soup(url: str, a_session=None, timeout=TIMEOUT, features='html.parser', parse_only=None) -> BeautifulSoup:
     """Returns BeautifulSoup object from the corresponding URL, passed as a string.
-    Creates Response object from HTTP GET request, using requests.get(<url string>, allow_redirects=False),
-    and then uses the text field of the Response object and the 'html.parser' to create the BeautifulSoup object.
+    Creates Response object from HTTP GET request, using <session>.get(<url string>, timeout=timeout),
+    and then uses the text field of the Response object and the parser named by features ('html.parser' by default)
+    to create the BeautifulSoup object; if parse_only (a SoupStrainer, such as M_INFO_TAGS) is specified,
+    only the matching tags are built.
+    The request is made through a_session if specified, otherwise through the shared session (see make_session()).
     """
 
-    # Create Response object from HTTP GET request; assume that no redirection is allowed (allow_redirects=False)
-    response = requests.get(url)
+    # Create Response object from HTTP GET request, reusing a pooled connection if possible
+    response = (a_session or session).get(url, timeout=timeout)
 
     # Get text from the Response object, using <response>.text
     response_text = response.text
 
-    # Create and return the corresponding BeautifulSoup object from the response text; use features='html.parser'
-    return BeautifulSoup(response_text, features='html.parser')
+    # Create and return the corresponding BeautifulSoup object from the response text
+    return BeautifulSoup(response_text, features=features, parse_only=parse_only)
 
 
 def get_specific_page(start_url: str, page=1):
@@ -40,7 +106,7 @@ def get_specific_page(start_url: str, page=1):
     return start_url
 
 
-def get_next_soup(start_url: str, page=1):
+def get_next_soup(start_url: str, page=1, a_session=None, targeted=False):
     """Returns the BeautifulSoup object corresponding to a specific page
     in case there are multiple pages that list objects of interest.
     Parameters:
@@ -49,101 +115,300 @@ def get_next_soup(start_url: str, page=1):
     Essentially, get_next_soup() just returns get_soup(get_specific_page(start_url, page)),
     i.e. converts the result of the call to get_specific_page(start_url, page), which is a string,
     into a BeautifulSoup object.
+    If targeted is True, only the tags needed for movie info (M_INFO_TAGS) are built, using the fastest parser
+    available (get_fast_parser()), which is enough for get_page_m_info() but not for the other uses of the soup.
     """
 
-    return get_soup(get_specific_page(start_url, page))
+    if targeted:
+        return get_soup(get_specific_page(start_url, page), a_session,
+                        features=get_fast_parser(), parse_only=M_INFO_TAGS)
+    return get_soup(get_specific_page(start_url, page), a_session)
 
 
-def crawl(url: str, max_pages=1):
+def crawl(url: str, max_pages=1, a_session=None, targeted=False):
     """Web crawler that collects info about movies from IMDb,
     implemented as a Python generator that yields BeautifulSoup objects (get_next_soup()) from multi-page movie lists.
-    Parameters: the url of the starting IMDb page and the max number of pages to crawl in case of multi-page lists.
+    Parameters: the url of the starting IMDb page and the max number of pages to crawl in case of multi-page lists,
+    and optionally the session to use instead of the shared one, and targeted (passed to get_next_soup()).
     """
 
     # p = 0
     for p in range(max_pages):
-        yield get_next_soup(start_url, p+1)
+        yield get_next_soup(url, p+1, a_session, targeted)
         # p += 1
 
 
+async def crawl_async(url: str, max_pages=1, concurrency=4, a_session=None, targeted=False):
+    """Asynchronous version of crawl(), implemented as an async generator.
+    Fetches up to concurrency pages at the same time (each get_next_soup() call runs in a separate thread,
+    using asyncio.to_thread(), since requests is not an asyncio library), but still yields BeautifulSoup objects
+    in the page order. Use it with async for, or through crawl_concurrently() from regular code.
+    Note that the session's pool_maxsize should not be less than concurrency (see make_session()),
+    otherwise the extra connections are not reused. The targeted parameter is passed to get_next_soup().
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(page):
+        async with semaphore:
+            return await asyncio.to_thread(get_next_soup, url, page, a_session, targeted)
+
+    tasks = [asyncio.create_task(fetch(p + 1)) for p in range(max_pages)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def crawl_concurrently(url: str, max_pages=1, concurrency=4, a_session=None, targeted=False):
+    """Runs crawl_async() in a new event loop and returns the list of BeautifulSoup objects, in the page order.
+    """
+
+    async def collect():
+        return [soup async for soup in crawl_async(url, max_pages, concurrency, a_session, targeted)]
+
+    return asyncio.run(collect())
+
+
 def get_4_digit_substring(a_string):
     """Returns the first 4-digit substring from a_string.
     It assumes that a_string contains a 4-digit substring representing a year.
-    Useful when the year of a movie release on IMDb is represented like '(1988, part 2)', or '(video, 2002)'."""
-    all_4_digit_substrings = [a_string[i:(i+4)] for i in range(len(a_string) - 3)]
-    for substring in all_4_digit_substrings:
-        if substring.isdigit():
-            return substring
-    return None
+    Useful when the year of a movie release on IMDb is represented like '(1988, part 2)', or '(video, 2002)'.
+    Uses a precompiled regex (FOUR_DIGITS), which finds the leftmost 4-digit substring in a single scan,
+    instead of creating the list of all 4-character substrings and checking them one by one."""
+    match = FOUR_DIGITS.search(a_string)
+    return match.group() if match else None
 
 
-def get_m_info(start_url: str, max_pages=1):
+def get_m_info(start_url: str, max_pages=1, a_session=None, concurrency=1, targeted=False):
     """
     Returns structured information about movies from a multi-page IMDb movie list.
     :param start_url: the url of the starting page of a multi-page IMDb movie list
     :param max_pages: the max number of pages to crawl
-    :return: a list of tuples of info-items about the movies from a multi-page IMDb movie list
-    Creates and uses the following data:
-    - h3_list - a list of all 'h3' tags from multiple IMDb pages
-                (each 'h3' tag contains: movie title, year of release, and (relative) link to the movie's IMDb page)
-    - poster_list - a list of all relevant 'div' tags from multiple IMDb pages
-                    (each such a 'div' tag contains the link to the poster of the corresponding movie)
-    - info_list - a list of 3-tuples of information about each movie from h3_list ((title, year, link) tuples)
-    - poster_link_list - a list of links to the posters of the movies from poster_list
-    - complete_list - a list of 4-tuples of information about each movie from info_list and poster_list
+    :param a_session: the session to use for the requests (the shared session by default)
+    :param concurrency: the max number of pages fetched at the same time (crawl_concurrently() is used if > 1)
+    :param targeted: whether to build only the tags needed for movie info, with the fastest parser (get_next_soup())
+    :return: a list of (title, year, link, poster_link) tuples about the movies from a multi-page IMDb movie list
+    The tuples are extracted from each page as it is crawled (get_page_m_info()), in the page order.
+    """
+
+    if concurrency > 1:
+        soups = crawl_concurrently(start_url, max_pages, concurrency, a_session, targeted)
+    else:
+        soups = crawl(start_url, max_pages, a_session, targeted)
+    return [m_info for soup in soups for m_info in get_page_m_info(soup)]
+
+
+def next_m_info(start_url: str, max_pages=1, a_session=None, targeted=False):
+    """Generator version of get_m_info(), which yields the (title, year, link, poster_link) tuples about the movies
+    from each page as soon as the page is fetched and parsed, instead of collecting them from all pages first.
+    Only one page (its BeautifulSoup object) is kept in memory at a time, regardless of max_pages.
+    The targeted parameter is passed to get_next_soup().
+    """
+
+    for soup in crawl(start_url, max_pages, a_session, targeted):
+        yield from get_page_m_info(soup)
+
+
+def get_checkpoint_file(start_url: str):
+    """Returns the Path object of the checkpoint file of get_m_info_resumable() for start_url,
+    located in the data directory and named after the hash of start_url.
+    """
+
+    return utility.get_data_dir() / f'crawl_{sha1(start_url.encode("utf-8")).hexdigest()[:16]}.jsonl'
+
+
+def get_m_info_resumable(start_url: str, max_pages=1, a_session=None, resume=True, targeted=False):
+    """Returns the same list as get_m_info(), but saves the progress of the crawl in a checkpoint file
+    (get_checkpoint_file(start_url)), so that a crawl that has crashed can be resumed from where it has stopped.
+    After each page is crawled, its movie tuples are appended to the file as a single JSON line (the page number
+    and the list of tuples), so saving a checkpoint costs only as much as the page itself.
+    If resume is True, the pages already saved in the file are not crawled again (a line incomplete due to a crash
+    is removed from the file); otherwise, the crawl starts from the first page. The file is removed when the crawl is complete.
+    The targeted parameter is passed to get_next_soup().
+    """
+
+    checkpoint_file = get_checkpoint_file(start_url)
+    pages = {}
+    saved = 0                                           # the size of the complete lines of the file, in bytes
+    if resume and checkpoint_file.exists():
+        with open(checkpoint_file, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        break
+                    page = json.loads(line)
+                    pages[page['page']] = [tuple(m_info) for m_info in page['m_info']]
+                    saved += len(line)
+                except json.JSONDecodeError:
+                    break
+
+    with open(checkpoint_file, 'a' if pages else 'w', encoding='utf-8') as f:
+        f.truncate(saved)                               # drop the incomplete line, so that no line is appended to it
+        for p in range(1, max_pages + 1):
+            if p in pages:
+                continue
+            pages[p] = get_page_m_info(get_next_soup(start_url, p, a_session, targeted))
+            f.write(json.dumps({'page': p, 'm_info': pages[p]}) + '\n')
+            f.flush()
+
+    checkpoint_file.unlink()
+    return [m_info for p in range(1, max_pages + 1) for m_info in pages[p]]
+
+
+def get_movie_links(soup: BeautifulSoup, page_url: str):
+    """Returns the list of absolute links to movie pages ('/title/tt<digits>/') from a BeautifulSoup object,
+    without duplicates and without the query strings (such as '?ref_=...'), so that each movie has one URL.
+    Relative links are resolved against page_url (for IMDb pages, it is the same as appending them to BASE_URL).
+    """
+
+    links = []
+    for a in soup.find_all('a', href=re.compile(r'^(https?://[^/]+)?/title/tt\d+/')):
+        link = urljoin(page_url, a['href'].split('?')[0])
+        if link not in links:
+            links.append(link)
+    return links
+
+
+def crawl_frontier(start_url: str, max_pages=1, max_depth=1, a_session=None, seen=None):
+    """Web crawler that, unlike crawl(), also follows the links to movie pages (get_movie_links()),
+    implemented as a Python generator that yields (url, depth, BeautifulSoup object) tuples.
+    The pages of the movie list (up to max_pages) have depth 0, the movie pages linked from them have depth 1,
+    the movie pages linked from those have depth 2, etc., up to max_depth.
+    The URLs to visit are kept in a util.frontier.Frontier, which visits the pages in the order of their depth
+    (all list pages first, then the movies from them,...) and never adds a URL twice; seen is passed to the Frontier
+    (a memory-bounded BloomFilter by default).
+    """
+
+    frontier = Frontier(max_depth, seen)
+    for p in range(max_pages):
+        frontier.add(get_specific_page(start_url, p + 1), depth=0, priority=0)
+    while frontier:
+        url, depth = frontier.pop()
+        soup = get_soup(url, a_session)
+        for link in get_movie_links(soup, url):
+            frontier.add(link, depth + 1, priority=depth + 1)
+        yield url, depth, soup
+
+
+def download_poster(link: str, poster_link: str, poster_dir, a_session=None, chunk_size=64 * 1024):
+    """Downloads the poster of the movie with the IMDb link to the file <poster_dir>/<movie id><poster extension>
+    (e.g. tt0000001.jpg; '.jpg' if the path of poster_link has no extension), unless the file already exists.
+    Returns the ('downloaded', <number of bytes>) tuple, or ('skipped', 0) if the file already exists.
+    The poster is streamed to the file in chunks of chunk_size bytes (<response>.iter_content(), with stream=True),
+    so the entire image is never held in memory. It is first written to a .part file, and renamed when complete,
+    so an interrupted download is never mistaken for an existing poster; if the download fails,
+    the .part file is removed and the exception is re-raised.
     """
 
-    # Initialize h3_list and poster_list as empty lists, as well as the generator object (crawl(start_url, max_pages))
-    h3_list = []
-    poster_list = []
-    crawler = crawl(start_url, max_pages)
+    movie_id = link.rstrip('/').rsplit('/', maxsplit=1)[-1]
+    extension = PurePosixPath(urlsplit(poster_link).path).suffix or '.jpg'
+    poster_file = poster_dir / (movie_id + extension)
+    if poster_file.exists():
+        return 'skipped', 0
+
+    size = 0
+    part_file = poster_dir / (movie_id + extension + '.part')
+    try:
+        with (a_session or session).get(poster_link, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            with open(part_file, 'wb') as f:
+                for chunk in response.iter_content(chunk_size):
+                    f.write(chunk)
+                    size += len(chunk)
+        part_file.replace(poster_file)
+    except BaseException:
+        part_file.unlink(missing_ok=True)
+        raise
+    return 'downloaded', size
+
+
+def download_posters(m_info, poster_dir=None, concurrency=8, base_url=BASE_URL, a_session=None):
+    """Downloads the posters of the movies from m_info (a list of (title, year, link, poster_link) tuples,
+    such as the one returned by get_m_info()) to poster_dir (<data dir>/posters by default),
+    using up to concurrency threads at the same time (see download_poster()).
+    Relative poster links are resolved against base_url.
+    Returns the dictionary with the numbers of downloaded, skipped (already present) and failed posters,
+    the bytes downloaded, the time (in seconds) and the download speed (bytes per second).
+    A poster that cannot be downloaded (e.g. 404 Not Found, or a connection error) is counted as failed,
+    and the other posters are still downloaded.
+    Note that the session's pool_maxsize should not be less than concurrency (see make_session()).
+    """
 
-    # In a while True loop, get the next soup from the generator and use it to populate h3_list and poster_list
-    # by extending them with the relevant tags from the soup
-    # (find all 'h3' tags and 'div' tags that contain class="lister-item-image ribbonize" attribute)
-    while True:
+    def download(m):
         try:
-            next_page = next(crawler)
-            h3_list.extend(next_page.find_all('h3')[:-1])
-            poster_list.extend(next_page.find_all('div', {'class': "lister-item-image ribbonize"}))
-        except StopIteration:
-            break
-
-    # Initialize info_list as an empty list.
-    # Repeat the following steps for each h3 in a for loop over h3_list:
-    # Extract title from h3.a.text (strip() it in order to eliminate leading/trailing whitespace).
-    # Extract year from <span class="lister-item-year text-muted unbold"> using h3.find(...).text,
-    # and filter it by get_4_digit_substring(year); set year to 'unknown' if get_4_digit_substring(year) returns None.
-    # Extract relative link from h3.a['href'] (make sure to lstrip('/') from it as well) and append it to BASE_URL.
-    # Append (title, year, link) to info_list.
-    info_list = []
-    for h3 in h3_list:
+            return download_poster(m[2], urljoin(base_url, m[3]), poster_dir, a_session)
+        except (requests.RequestException, OSError):
+            return 'failed', 0
+
+    poster_dir = poster_dir if poster_dir else utility.get_data_dir() / 'posters'
+    poster_dir.mkdir(parents=True, exist_ok=True)
+    start = perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(download, m_info))
+    seconds = perf_counter() - start
+    size = sum(size for _, size in results)
+    stats = {status: sum(1 for s, _ in results if s == status) for status in ['downloaded', 'skipped', 'failed']}
+    return {**stats, 'bytes': size, 'seconds': seconds, 'bytes_per_sec': size / seconds if seconds else 0}
+
+
+def get_fast_parser():
+    """Returns the name of the fastest HTML parser available to BeautifulSoup:
+    'lxml' if the lxml package is installed (it is several times faster), and the built-in 'html.parser' otherwise.
+    The parser is detected once, when the module is imported (FAST_PARSER).
+    """
+
+    return FAST_PARSER
+
+
+def get_page_m_info(soup: BeautifulSoup):
+    """Returns the list of (title, year, link, poster_link) tuples about the movies from a single IMDb page,
+    extracted from the page's BeautifulSoup object; get_m_info() and next_m_info() use it for each crawled page.
+    Works both with the soup of the entire page and with the soup built with parse_only=M_INFO_TAGS
+    (hence the 'h3' tags are selected by their class, rather than by dropping the last 'h3' tag of the page).
+    """
+
+    m_info = []
+    h3_list = soup.find_all('h3', {'class': "lister-item-header"})
+    poster_list = soup.find_all('div', {'class': "lister-item-image ribbonize"})
+    for h3, poster in zip(h3_list, poster_list):
         title = h3.a.text.strip()
-        year = h3.find('span', {'class': "lister-item-year text-muted unbold"}).text
-        year = get_4_digit_substring(year)
+        year = get_4_digit_substring(h3.find('span', {'class': "lister-item-year text-muted unbold"}).text)
         year = year if year else 'unknown'
         link = BASE_URL + h3.a['href'].lstrip('/')
-        info_list.append((title, year, link))
+        m_info.append((title, year, link, poster.a.img['loadlate']))
+    return m_info
 
-    # Initialize poster_link_list as an empty list.
-    # In a for loop over all posters in poster_list, extract the poster link from poster.a.img['loadlate']
-    # and append it to poster_link_list.
-    # Note that extraction from poster.a.img['src'] does not work. Check the saved HTML code (soup) of the entire page.
-    poster_link_list = []
-    for poster in poster_list:
-        poster_link = poster.a.img['loadlate']
-        poster_link_list.append(poster_link)
 
-    # Initialize complete_list as an empty list.
-    # In a for loop over zip(info_list, poster_link_list) extract (title, year, link, poster_link) tuples and
-    # append them to complete_list.
-    # Return complete_list.
-    complete_list = []
-    for info, poster_link in zip(info_list, poster_link_list):
-        title, year, link = info
-        complete_list.append((title, year, link, poster_link))
+def parse_m_info(page_html, targeted=False):
+    """Returns the list of (title, year, link, poster_link) tuples about the movies from the HTML of a single IMDb page
+    (bytes or str). Runs in the worker processes of get_m_info_parallel(), so it must be a module-level function.
+    If targeted is True, only the tags from M_INFO_TAGS (and their subtrees) are built, using the fastest parser
+    available (get_fast_parser()); otherwise, the entire page is parsed with 'html.parser'.
+    """
 
-    return complete_list
+    if targeted:
+        return get_page_m_info(BeautifulSoup(page_html, features=get_fast_parser(), parse_only=M_INFO_TAGS))
+    return get_page_m_info(BeautifulSoup(page_html, features='html.parser'))
+
+
+def get_m_info_parallel(start_url: str, max_pages=1, processes=None, a_session=None, targeted=False):
+    """Returns the same list as get_m_info(), but parses the pages in a pool of processes.
+    The pages are fetched one after another in the calling process, and the raw HTML of each page
+    (<response>.content, bytes) is handed to the process pool as soon as it arrives, so the pages are parsed
+    in parallel with fetching and with each other, using up to processes CPU cores (all of them by default).
+    Only the compact lists of tuples are returned from the worker processes, not the BeautifulSoup objects.
+    The targeted parameter is passed to parse_m_info().
+    """
+
+    with ProcessPoolExecutor(processes) as executor:
+        futures = []
+        for p in range(max_pages):
+            response = (a_session or session).get(get_specific_page(start_url, p + 1), timeout=TIMEOUT)
+            futures.append(executor.submit(parse_m_info, response.content, targeted))
+        return [m_info for future in futures for m_info in future.result()]
 
 
 if __name__ == "__main__":
@@ -267,13 +532,183 @@ if __name__ == "__main__":
     # print(get_4_digit_substring('123fghb456fghk1234'))
     # print()
 
-    # Test get_m_info()
-    start_url = 'https://www.imdb.com/search/keyword/?keywords=rock-%27n%27-roll%2Crock-music&ref_=kw_ref_key&' \
-                'mode=detail&page=1&sort=moviemeter,asc'
-    for info in get_m_info(start_url, 3):
+    # Compare get_4_digit_substring() with its earlier version, which created the list of all 4-character substrings
+    from timeit import timeit
+
+    def get_4_digit_substring_from_list(a_string):
+        all_4_digit_substrings = [a_string[i:(i+4)] for i in range(len(a_string) - 3)]
+        for substring in all_4_digit_substrings:
+            if substring.isdigit():
+                return substring
+        return None
+
+    years = [f'({1900 + i % 125})' for i in range(100_000)] + \
+            [f'({1900 + i % 125}, part {i % 5})' for i in range(100_000)] + \
+            [f'(video, {1900 + i % 125})' for i in range(100_000)] + \
+            [f'(TV Mini Series, {1900 + i % 125}–{1901 + i % 125})' for i in range(100_000)] + ['', '(I)', '(video)']
+    for f in [get_4_digit_substring_from_list, get_4_digit_substring]:
+        print(f'{f.__name__}: {timeit(lambda: [f(year) for year in years], number=1):.2f}s')
+    print([get_4_digit_substring(year) for year in years] == [get_4_digit_substring_from_list(year) for year in years])
+    print()
+
+    # # Test get_m_info()
+    # start_url = 'https://www.imdb.com/search/keyword/?keywords=rock-%27n%27-roll%2Crock-music&ref_=kw_ref_key&' \
+    #             'mode=detail&page=1&sort=moviemeter,asc'
+    # for info in get_m_info(start_url, 3):
+    #     print(info)
+    # print()
+
+    # Test get_m_info() against the local IMDb-like server from testdata.imdb
+    from testdata.imdb import start_server, get_start_url
+    server = start_server()
+    start_url = get_start_url(server)
+    for info in get_m_info(start_url, 3)[:3]:
         print(info)
     print()
 
+    # Test connection reuse: the shared session vs. a new connection per request (requests.get())
+    print(get_connection_stats())
+    connections = server.connections
+    for p in range(1, 4):
+        get_soup(get_specific_page(start_url, p))
+    print(f'get_soup(): {server.connections - connections} new connection(s) for 3 pages')
+    connections = server.connections
+    for p in range(1, 4):
+        requests.get(get_specific_page(start_url, p))
+    print(f'requests.get(): {server.connections - connections} new connection(s) for 3 pages')
+    print()
+
+    server.shutdown()
+
+    # Compare sequential and concurrent crawling against a local server with latency injected into each response
+    server = start_server(pages=10, latency=0.2)
+    start_url = get_start_url(server)
+    for concurrency in [1, 2, 5, 10]:
+        start = perf_counter()
+        m_info = get_m_info(start_url, 10, concurrency=concurrency)
+        print(f'concurrency={concurrency}: {len(m_info)} movies in {perf_counter() - start:.2f}s')
+    print(m_info == get_m_info(start_url, 10))
+    print()
+
+    # Compare the time to the first result of get_m_info() and next_m_info()
+    start = perf_counter()
+    first = get_m_info(start_url, 10)[0]
+    print(f'get_m_info(): {perf_counter() - start:.2f}s to the first movie')
+    start = perf_counter()
+    first = next(next_m_info(start_url, 10))
+    print(f'next_m_info(): {perf_counter() - start:.2f}s to the first movie')
+    print(list(next_m_info(start_url, 10)) == m_info)
+    start = perf_counter()
+    m_info_targeted = get_m_info(start_url, 10, targeted=True)
+    print(f'get_m_info(targeted=True): {perf_counter() - start:.2f}s')
+    print(m_info_targeted == m_info, list(next_m_info(start_url, 10, targeted=True)) == m_info)
+    print()
+
+    # Test resuming a crawl that has crashed at page 5 (simulated by a session that fails to get that page)
+    class CrashingSession(requests.Session):
+        def get(self, url, **kwargs):
+            if '&page=5&' in url:
+                raise requests.ConnectionError('simulated crash')
+            return super().get(url, **kwargs)
+
+    try:
+        get_m_info_resumable(start_url, 10, CrashingSession())
+    except requests.ConnectionError as e:
+        print(e)
+    start = perf_counter()
+    m_info_resumed = get_m_info_resumable(start_url, 10)
+    print(f'get_m_info_resumable(): resumed in {perf_counter() - start:.2f}s')
+    print(m_info_resumed == m_info)
+    print()
+
+    # Test crawling beyond the list pages: the list pages, the movie pages linked from them, and the movies linked
+    # from those (many links point to the same movies, but each page is fetched only once)
+    server.latency = 0
+    depths = {}
+    for url, depth, soup in crawl_frontier(start_url, 2, max_depth=2):
+        depths[depth] = depths.get(depth, 0) + 1
+    print(f'pages crawled per depth: {depths}')
+    print()
+
+    # Test downloading posters (the posters that are already downloaded are skipped the second time)
+    import tempfile
+    from pathlib import Path
+    m_info = get_m_info(start_url, 2)
+    poster_dir = Path(tempfile.mkdtemp())
+    m_info[0] = m_info[0][:3] + ('/posters/tt9999999.jpg',)         # a poster that does not exist (404 Not Found)
+    for i in range(2):
+        stats = download_posters(m_info, poster_dir, base_url=start_url)
+        print(f'{stats["downloaded"]} downloaded, {stats["skipped"]} skipped, {stats["failed"]} failed, '
+              f'{stats["bytes"] / 2**20:.1f} MB at {stats["bytes_per_sec"] / 2**20:.1f} MB/s')
+    print(sorted(p.suffix for p in poster_dir.iterdir())[-1])         # no .part files left
+    print()
+
+    # Compare parsing the pages in the crawling process and in a process pool, for different numbers of processes
+    # (it makes sense only for as many processes as there are CPU cores)
+    import os
+    server.latency = 0
+    start = perf_counter()
+    m_info = get_m_info(start_url, 10)
+    print(f'get_m_info(): {perf_counter() - start:.2f}s')
+    for processes in sorted({1, 2, 4, os.cpu_count()}):
+        start = perf_counter()
+        m_info_parallel = get_m_info_parallel(start_url, 10, processes)
+        print(f'get_m_info_parallel(), {processes} process(es): {perf_counter() - start:.2f}s')
+    print(m_info == m_info_parallel)
+    server.latency = 0.2
+    print()
+
+    # Compare parsing the entire pages with 'html.parser' and targeted parsing (M_INFO_TAGS and get_fast_parser())
+    import tracemalloc
+    from testdata.imdb import imdb_page
+    pages = [imdb_page(p + 1).encode('utf-8') for p in range(10)]
+    for targeted in [False, True]:
+        start = perf_counter()
+        m_info_parsed = [m_info for page in pages for m_info in parse_m_info(page, targeted)]
+        parse_time = perf_counter() - start
+        tracemalloc.start()
+        parse_m_info(pages[0], targeted)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'targeted={targeted}: {parse_time:.2f}s, peak memory per page {peak / 2**20:.1f} MB')
+    print(m_info_parsed == m_info)
+    print()
+
+    # Test the HTTP response cache (util.httpcache.CachedSession): the first crawl fills the cache,
+    # the second one gets everything from the cache, and after the TTL expires
+    # the pages are revalidated (and downloaded again only if they have changed)
+    from util.httpcache import CachedSession
+    cached_session = make_session(session_class=CachedSession, ttl=60)
+    cached_session.clear()
+    for i in range(4):
+        if i == 2:
+            cached_session.ttl = 0                      # simulate the TTL expiry
+        if i == 3:
+            server.version += 1                         # simulate changed pages
+        start = perf_counter()
+        get_m_info(start_url, 10, cached_session)
+        print(f'{perf_counter() - start:.2f}s', cached_session.get_cache_stats())
+    cached_session.close()                              # compacts the index of the cache
+    print()
+
+    server.shutdown()
+
+    # Test crawling a server that allows at most 5 requests per second: without rate limiting some of the pages
+    # are lost (429 Too Many Requests); with util.ratelimit.ThrottledSession the requests are paced and retried
+    from util.ratelimit import ThrottledSession
+    server = start_server(pages=10, rate_limit=5)
+    start_url = get_start_url(server)
+    m_info = get_m_info(start_url, 10, concurrency=10)
+    print(f'requests.Session: {len(m_info)} movies, {server.throttled} requests throttled')
+    throttled_session = make_session(session_class=ThrottledSession, rate=10, burst=5)
+    start = perf_counter()
+    m_info = get_m_info(start_url, 10, throttled_session, concurrency=10)
+    print(f'ThrottledSession: {len(m_info)} movies, {server.throttled} requests throttled, '
+          f'{throttled_session.retries} retries, {perf_counter() - start:.2f}s')
+    print()
+
+    server.shutdown()
+
     """
     HTML tags with examples:
     https://www.tutorialstonight.com/html-tags-list-with-examples.php
@@ -0,0 +1,95 @@
+"""Offline benchmarks of the crawler (music.crawl).
+The benchmarks run against the local IMDb-like server from testdata.imdb, which serves either generated pages
+or IMDb list pages recorded earlier with record_pages(), with configurable latency, bandwidth and error rate.
+Run this module to print the report; compare it with the report of the previous version of music/crawl.py
+to catch performance regressions before deployment.
+"""
+
+from statistics import quantiles
+from time import perf_counter
+import tracemalloc
+
+from music.crawl import *
+from testdata.imdb import start_server, get_start_url
+from util import utility
+
+
+def record_pages(start_url: str, max_pages=1, fixture_dir=None):
+    """Saves the pages of a multi-page IMDb movie list as page_<n>.html files in fixture_dir
+    (<data dir>/imdb_pages by default), to be served by the local server (start_server(fixture_dir=...)).
+    Returns fixture_dir.
+    """
+
+    fixture_dir = fixture_dir if fixture_dir else utility.get_data_dir() / 'imdb_pages'
+    fixture_dir.mkdir(parents=True, exist_ok=True)
+    for p in range(max_pages):
+        response = session.get(get_specific_page(start_url, p + 1), timeout=TIMEOUT)
+        (fixture_dir / f'page_{p + 1}.html').write_bytes(response.content)
+    return fixture_dir
+
+
+def measure(f, args_list, items=None):
+    """Calls f(*args) for each args from args_list and returns the dictionary of measurements:
+    the number of calls, the total time, the throughput (calls per second, and items per second if items
+    is a function that returns the number of items in the result of f, e.g. the number of movies),
+    the 50th, 90th and 99th latency percentiles (in milliseconds) and the peak memory (in MB).
+    The peak memory is measured with tracemalloc in a separate call to f (tracemalloc slows down the code).
+    """
+
+    latencies = []
+    n_items = 0
+    for args in args_list:
+        start = perf_counter()
+        result = f(*args)
+        latencies.append(perf_counter() - start)
+        n_items += items(result) if items else 0
+    tracemalloc.start()
+    f(*args_list[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(latencies)
+    p50, p90, p99 = [quantiles(latencies, n=100, method='inclusive')[i] * 1000 for i in [49, 89, 98]] \
+        if len(latencies) > 1 else [latencies[0] * 1000] * 3
+    return {'calls': len(latencies), 'seconds': total, 'calls_per_sec': len(latencies) / total,
+            'items_per_sec': n_items / total, 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99, 'peak_mb': peak / 2**20}
+
+
+def run_benchmarks(start_url: str, max_pages=10, runs=5, a_session=None):
+    """Measures get_soup() (for each page), crawl() and get_m_info() (for all max_pages pages) runs times,
+    and returns the dictionary of their measurements (see measure()).
+    """
+
+    page_urls = [get_specific_page(start_url, p + 1) for p in range(max_pages)]
+    return {
+        'get_soup': measure(get_soup, [(url, a_session) for url in page_urls * runs]),
+        'crawl': measure(lambda: list(crawl(start_url, max_pages, a_session)), [()] * runs, items=len),
+        'get_m_info': measure(get_m_info, [(start_url, max_pages, a_session)] * runs, items=len),
+    }
+
+
+def print_report(results):
+    print(f'{"":<12}{"calls":>7}{"calls/s":>9}{"items/s":>9}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"peak MB":>9}')
+    for name, m in results.items():
+        print(f'{name:<12}{m["calls"]:>7}{m["calls_per_sec"]:>9.1f}{m["items_per_sec"]:>9.1f}'
+              f'{m["p50_ms"]:>9.1f}{m["p90_ms"]:>9.1f}{m["p99_ms"]:>9.1f}{m["peak_mb"]:>9.1f}')
+
+
+if __name__ == "__main__":
+
+    # # Record real IMDb pages first (requires Internet access), and then benchmark the crawler against them
+    # start_url = 'https://www.imdb.com/search/keyword/?keywords=rock-%27n%27-roll%2Crock-music&ref_=kw_ref_key&' \
+    #             'mode=detail&page=1&sort=moviemeter,asc'
+    # fixture_dir = record_pages(start_url, 10)
+    fixture_dir = None
+
+    # Server conditions: no delays, a remote server (latency and bandwidth), an unreliable server (errors)
+    server_conditions = {'local': {},
+                         'remote': {'latency': 0.05, 'bandwidth': 2 * 2**20},
+                         'unreliable': {'latency': 0.05, 'error_rate': 0.1}}
+    for name, conditions in server_conditions.items():
+        server = start_server(pages=10, fixture_dir=fixture_dir, **conditions)
+        print(f'{name} server: {conditions}')
+        print_report(run_benchmarks(get_start_url(server), max_pages=10, runs=3))
+        print()
+        server.shutdown()
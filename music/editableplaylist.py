@@ -0,0 +1,336 @@
+"""Editable playlists, whose versions (snapshots) share the unchanged parts of their lists of songs.
+"""
+
+from bisect import bisect_right
+from itertools import accumulate, chain
+import copy
+
+from music.playlist import *
+
+
+class SongNode:
+    """A node of the tree of a SongSequence: either a leaf (a chunk), whose items are songs,
+    or an inner node, whose items are its child nodes, with the cumulative lengths of the children (ends)
+    for finding the child with a song position by binary search. Nodes are never changed after they are created
+    (only their fingerprint is computed and kept on the first call of fingerprint()), so they can be shared
+    by any number of sequences.
+    """
+
+    __slots__ = ('leaf', 'items', 'ends', 'length', '__fingerprint')
+
+    def __init__(self, leaf, items):
+        self.leaf = leaf
+        self.items = items
+        self.ends = None if leaf else tuple(accumulate(child.length for child in items))
+        self.length = len(items) if leaf else self.ends[-1]
+        self.__fingerprint = None
+
+    def fingerprint(self):
+        if self.__fingerprint is None:
+            if self.leaf:
+                self.__fingerprint = songs_fingerprint(self.items)
+            else:
+                f = 0
+                for child in self.items:
+                    f = combine_fingerprints(f, child.fingerprint(), child.length)
+                self.__fingerprint = f
+        return self.__fingerprint
+
+
+class SongSequence:
+    """Immutable (persistent) sequence of songs, stored as a balanced tree (a B-tree) of SongNode objects:
+    the leaves are chunks of up to chunk_size songs, and each inner node has up to branching children.
+    Editing a sequence (append(), insert(), delete(), move()) does not change it, but returns a new sequence
+    that shares all the nodes except those on the path from the root to the edited chunk with the original one.
+    So an edit copies one chunk and O(log n) inner nodes of up to branching children (each with its own lengths
+    of the children, so no offsets of other nodes are recomputed), i.e. it takes O(log n) time instead of O(n)
+    for a tuple of n songs, and keeping the old version (a snapshot) costs nothing.
+    A node that gets too big is split in two, and a node that gets less than half full after a delete is merged
+    with (or takes items from) its neighbour, so the tree stays balanced and its chunks stay at least half full
+    (except those at the end of the sequence, which are filled by append()).
+    Each node keeps its fingerprint (see songs_fingerprint() from music.playlist), so the fingerprint
+    of the whole sequence (fingerprint()) after an edit recomputes only the fingerprints of the copied nodes.
+    Supports len(), indexing, iteration and comparison (==) with other sequences of songs, such as tuples.
+    """
+
+    chunk_size = 64
+    branching = 32
+
+    def __init__(self, songs=(), root=None):
+        if root is None:
+            nodes = [SongNode(True, chunk) for chunk in self.even_parts(tuple(songs), self.chunk_size)]
+            while len(nodes) > 1:
+                nodes = [SongNode(False, children) for children in self.even_parts(tuple(nodes), self.branching)]
+            root = nodes[0] if nodes else SongNode(True, ())
+        self.root = root
+
+    @staticmethod
+    def even_parts(items, max_size):
+        """Splits items into the fewest parts of at most max_size items, of (almost) equal sizes.
+        """
+
+        n = -(-len(items) // max_size)
+        return [items[len(items) * i // n:len(items) * (i + 1) // n] for i in range(n)]
+
+    def __len__(self):
+        return self.root.length
+
+    def __iter__(self):
+        return chain.from_iterable(self.chunks())
+
+    def chunks(self, node=None):
+        """Generator that yields the chunks (tuples of songs) of the sequence, in order.
+        """
+
+        node = node if node else self.root
+        if node.leaf:
+            yield node.items
+        else:
+            for child in node.items:
+                yield from self.chunks(child)
+
+    def slice_chunks(self, node, start, stop):
+        """Generator that yields the parts of the chunks of the node (tuples of songs) with its songs
+        from position start to position stop of the node, in order, visiting only the nodes with those songs.
+        """
+
+        if node.leaf:
+            yield node.items[start:stop]
+            return
+        k = bisect_right(node.ends, start)
+        while k < len(node.items) and (node.ends[k - 1] if k else 0) < stop:
+            offset = node.ends[k - 1] if k else 0
+            yield from self.slice_chunks(node.items[k], max(start - offset, 0), stop - offset)
+            k += 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):                 # a tuple, built from the chunks with the sliced songs only
+            positions = range(*position.indices(len(self)))
+            if not positions:
+                return ()
+            first, last = min(positions[0], positions[-1]), max(positions[0], positions[-1])
+            songs = tuple(chain.from_iterable(self.slice_chunks(self.root, first, last + 1)))
+            return songs[positions[0] - first::position.step or 1]
+        position = self.check_position(position)
+        node = self.root
+        while not node.leaf:
+            k = bisect_right(node.ends, position)
+            position -= node.ends[k - 1] if k else 0
+            node = node.items[k]
+        return node.items[position]
+
+    def __eq__(self, other):
+        if isinstance(other, SongSequence) and self.fingerprint() != other.fingerprint():
+            return False
+        try:
+            return len(self) == len(other) and all(s1 == s2 for s1, s2 in zip(self, other))
+        except TypeError:
+            return False
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'SongSequence({tuple(self)})'
+
+    def fingerprint(self):
+        """Returns the fingerprint of the sequence (equal to songs_fingerprint(<the sequence>)),
+        combined from the fingerprints of the nodes (computing only those that are not computed yet).
+        """
+
+        return self.root.fingerprint()
+
+    def check_position(self, position):
+        """Returns the position of an existing song (which can be negative) as a non-negative position.
+        """
+
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('song position out of range')
+        return position
+
+    def make_nodes(self, leaf, items, at_end=False):
+        """Returns a tuple of one node with the items, or of two nodes if there are too many items for one node.
+        The items are split in half, or, if at_end (an item has been added at the end), so that the first node
+        is full, which keeps the nodes full when a sequence is built with append().
+        """
+
+        max_size = self.chunk_size if leaf else self.branching
+        if len(items) <= max_size:
+            return (SongNode(leaf, items),)
+        half = max_size if at_end else len(items) // 2
+        return SongNode(leaf, items[:half]), SongNode(leaf, items[half:])
+
+    def insert_into(self, node, position, song):
+        """Returns the nodes (one, or two if the node has been split) that replace the node after inserting
+        the song at position of the node.
+        """
+
+        if node.leaf:
+            return self.make_nodes(True, node.items[:position] + (song,) + node.items[position:],
+                                   position == node.length)
+        k = min(bisect_right(node.ends, position), len(node.items) - 1)
+        start = node.ends[k - 1] if k else 0
+        items = node.items[:k] + self.insert_into(node.items[k], position - start, song) + node.items[k + 1:]
+        return self.make_nodes(False, items, position == node.length)
+
+    def delete_from(self, node, position):
+        """Returns the node that replaces the node after deleting the song at position of the node.
+        A child that gets less than half full is merged with its neighbour (or takes items from it,
+        if there are too many items for one node).
+        """
+
+        if node.leaf:
+            return SongNode(True, node.items[:position] + node.items[position + 1:])
+        k = bisect_right(node.ends, position)
+        start = node.ends[k - 1] if k else 0
+        child = self.delete_from(node.items[k], position - start)
+        items = node.items[:k] + (child,) + node.items[k + 1:]
+        if len(child.items) < (self.chunk_size if child.leaf else self.branching) // 2 and len(items) > 1:
+            k = k if k + 1 < len(items) else k - 1      # merge the child with the next one (or the previous one)
+            items = items[:k] + self.make_nodes(child.leaf, items[k].items + items[k + 1].items) + items[k + 2:]
+        return SongNode(False, items)
+
+    def append(self, song):
+        return self.insert(len(self), song)
+
+    def insert(self, position, song):
+        """Returns a new sequence with the song inserted before position (like list.insert(), position can be
+        negative, and a position beyond the end of the sequence appends the song).
+        """
+
+        if position < 0:
+            position = max(position + len(self), 0)
+        nodes = self.insert_into(self.root, min(position, len(self)), song)
+        return SongSequence(root=nodes[0] if len(nodes) == 1 else SongNode(False, nodes))
+
+    def delete(self, position):
+        root = self.delete_from(self.root, self.check_position(position))
+        while not root.leaf and len(root.items) == 1:   # remove the root with a single child
+            root = root.items[0]
+        return SongSequence(root=root)
+
+    def move(self, source, destination):
+        """Returns a new sequence in which the song from the source position is at the destination position
+        (both can be negative, e.g. move(0, -1) moves the first song to the end); the other songs keep their order.
+        """
+
+        song = self[source]
+        destination = self.check_position(destination)
+        return self.delete(source).insert(destination, song)
+
+
+class EditablePlaylist(Playlist):
+    """The class representing the concept of playlist whose songs can be edited (appended, inserted, deleted, moved).
+    The songs are kept in a SongSequence instead of a tuple; each edit replaces it with a new SongSequence,
+    so a snapshot of the playlist (snapshot()) is just a shallow copy that keeps the current SongSequence,
+    and it does not change when the playlist is edited afterwards.
+    Since self.songs is still a sequence of songs, the other features of Playlist (__str__(), __eq__(),
+    fingerprint(), the lookup index,...) work the same way; playlist_json_to_py() decodes the JSON
+    of an EditablePlaylist (playlist_py_to_json()) as an EditablePlaylist again.
+    """
+
+    def __init__(self, name, *songs, created=date.today(), completed=date.today()):
+        super().__init__(name, created=created, completed=completed)
+        self.songs = SongSequence(songs)
+
+    def append(self, song):
+        self.songs = self.songs.append(song)
+
+    def insert(self, position, song):
+        self.songs = self.songs.insert(position, song)
+
+    def delete(self, position):
+        self.songs = self.songs.delete(position)
+
+    def remove(self, song):
+        """Deletes the first occurrence of the song; raises ValueError if the song is not in the playlist.
+        """
+
+        for position, s in enumerate(self.songs):
+            if s == song:
+                self.delete(position)
+                return
+        raise ValueError('song not in playlist')
+
+    def move(self, source, destination):
+        self.songs = self.songs.move(source, destination)
+
+    def snapshot(self):
+        """Returns a copy of the playlist in its current state, sharing all the songs (and their chunks) with it.
+        """
+
+        return copy.copy(self)
+
+
+if __name__ == "__main__":
+
+    from testdata.songs import *
+    from timeit import timeit
+
+    # Demonstrate editing and snapshots
+    epl = EditablePlaylist('My songs', across_the_universe, imagine, created=date(2020, 2, 13))
+    first = epl.snapshot()
+    epl.append(love)
+    epl.insert(0, happiness_is_a_warm_gun)
+    epl.move(0, -1)
+    print(first)
+    print(epl)
+    epl.remove(love)
+    print(epl)
+    print(epl == EditablePlaylist('My songs', across_the_universe, imagine, happiness_is_a_warm_gun,
+                                  created=date(2020, 2, 13)))
+    epl_json = json.dumps(epl, default=playlist_py_to_json)
+    epl_from_json = json.loads(epl_json, object_hook=playlist_json_to_py)
+    print(epl_from_json)
+    print(type(epl_from_json).__name__, epl_from_json == epl)
+    print()
+
+    # Compare building a playlist song by song, with a tuple of songs (Playlist) and with EditablePlaylist
+    songs = [Song(f'Song {i}') for i in range(20_000)]
+
+    def build_playlist():
+        pl = Playlist('Big playlist')
+        for s in songs:
+            pl.songs = pl.songs + (s,)
+        return pl
+
+    def build_editable_playlist():
+        epl = EditablePlaylist('Big playlist')
+        for s in songs:
+            epl.append(s)
+        return epl
+
+    print(f'Playlist: {timeit(build_playlist, number=1):.2f}s')
+    print(f'EditablePlaylist: {timeit(build_editable_playlist, number=1):.2f}s')
+    big_epl = build_editable_playlist()
+    print(f'insert() in the middle: {timeit(lambda: big_epl.insert(10_000, love), number=100) / 100 * 1000:.3f} ms')
+    print(f'snapshot(): {timeit(big_epl.snapshot, number=100) / 100 * 1000:.3f} ms')
+    print(f'songs[10_000:10_010]: {timeit(lambda: big_epl.songs[10_000:10_010], number=100) / 100 * 1000:.3f} ms')
+    print()
+
+    # The cost of an edit does not depend on the number of songs (O(log n))
+    for n in [50_000, 200_000, 400_000]:
+        sequence = SongSequence(Song(f'Song {i}') for i in range(n))
+        print(f'{n} songs: append() {timeit(lambda: sequence.append(love), number=1000) / 1000 * 1e6:.1f} us, '
+              f'insert() {timeit(lambda: sequence.insert(n // 2, love), number=1000) / 1000 * 1e6:.1f} us, '
+              f'delete() {timeit(lambda: sequence.delete(n // 2), number=1000) / 1000 * 1e6:.1f} us')
+    print()
+
+    # Deleting songs merges the chunks that get less than half full
+    import random
+    sequence = SongSequence(songs)
+    for i in range(15_000):
+        sequence = sequence.delete(random.randrange(len(sequence)))
+    chunk_sizes = [len(chunk) for chunk in sequence.chunks()]
+    print(f'{len(sequence)} songs in {len(chunk_sizes)} chunks of {min(chunk_sizes)}-{max(chunk_sizes)} songs')
+    print()
+
+    # Fingerprints are kept in the nodes, so a fingerprint after an edit does not rehash all the songs
+    synced = big_epl.fingerprint()
+    big_epl.move(0, -1)
+    print(big_epl.fingerprint() != synced, big_epl.songs.fingerprint() == songs_fingerprint(big_epl.songs))
+    print(f'edit + fingerprint(): '
+          f'{timeit(lambda: (big_epl.move(0, -1), big_epl.fingerprint()), number=100) / 100 * 1000:.3f} ms, '
+          f'songs_fingerprint(): {timeit(lambda: songs_fingerprint(big_epl.songs), number=10) / 10 * 1000:.3f} ms')
+    print()
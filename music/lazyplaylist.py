@@ -0,0 +1,154 @@
+"""Lazy playlists, created from playlist strings (the __str__() format) without parsing their songs and dates
+until they are accessed.
+"""
+
+from music.playlist import *
+
+
+class LazySongs:
+    """Immutable sequence of songs parsed from the songs line of a playlist string ('<song>; <song>; ...'),
+    one song at a time, the first time it is accessed. Getting len(), a song or a slice parses only those songs;
+    iterating over the sequence (e.g. for ==, fingerprint(), the lookup index or JSON encoding) parses all the others.
+    The parsed songs are kept, so each song is parsed at most once.
+    """
+
+    def __init__(self, songs_str):
+        self.songs_str = songs_str
+        self.__strs = None                              # the song strings, split on the first access to a song
+        self.__songs = None                             # the songs, None for those not parsed yet
+        self.__parsed = False                           # whether all the songs are parsed
+
+    def __len__(self):
+        if self.__strs is not None:
+            return len(self.__strs)
+        return 0 if self.songs_str == '(empty)' else self.songs_str.count('; ') + 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return tuple(self[i] for i in range(*position.indices(len(self))))
+        self.split()
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError('song position out of range')
+        if self.__songs[position] is None:
+            self.__songs[position] = Song.from_str(self.__strs[position])
+        return self.__songs[position]
+
+    def __iter__(self):
+        if not self.__parsed:
+            self.split()
+            self.__songs = [Song.from_str(string) if song is None else song
+                            for song, string in zip(self.__songs, self.__strs)]
+            self.__parsed = True
+        return iter(self.__songs)
+
+    def split(self):
+        if self.__strs is None:
+            self.__strs = self.songs_str.split('; ') if self.songs_str != '(empty)' else []
+            self.__songs = [None] * len(self.__strs)
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(s1 == s2 for s1, s2 in zip(self, other))
+        except TypeError:
+            return False
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'LazySongs({self.songs_str!r})'
+
+
+class LazyPlaylist(Playlist):
+    """The class representing the concept of playlist, created from a playlist string (from_playlist_str())
+    without parsing it: the songs are a LazySongs sequence, and the dates are parsed on the first access
+    to self.created or self.completed. So getting the name of a playlist costs nothing, and getting its dates
+    does not parse its songs. __str__() returns the unparsed parts of the playlist string as they are.
+    Invalid dates (created after completed) raise PlaylistDateError when the dates are parsed.
+    """
+
+    def __init__(self, name, *songs, created=date.today(), completed=date.today()):
+        self.__dates_str = None                         # the unparsed dates line of the playlist string
+        super().__init__(name, *songs, created=created, completed=completed)
+
+    @property
+    def created(self):
+        self.parse_dates()
+        return self.__created
+
+    @created.setter
+    def created(self, created):
+        self.parse_dates()
+        self.__created = created
+
+    @property
+    def completed(self):
+        self.parse_dates()
+        return self.__completed
+
+    @completed.setter
+    def completed(self, completed):
+        self.parse_dates()
+        self.__completed = completed
+
+    def parse_dates(self):
+        if self.__dates_str is not None:
+            created, completed = [datetime.strptime(d, PREFERRED_DATE_FORMAT).date()
+                                  for d in self.__dates_str.split(' - ')]
+            if created > completed:
+                raise PlaylistDateError(created, completed)
+            self.__created, self.__completed = created, completed
+            self.__dates_str = None
+
+    def __str__(self):
+        if not isinstance(self.songs, LazySongs):
+            return super().__str__()
+        from_to = self.__dates_str if self.__dates_str is not None else \
+            format_date(self.created) + ' - ' + format_date(self.completed)
+        return '\n'.join([self.name, self.songs.songs_str, from_to])
+
+    # Alternative constructor
+    @classmethod
+    def from_playlist_str(cls, playlist_str):
+        name, songs_str, dates_str = playlist_str.split('\n')
+        playlist = cls(name)
+        playlist.songs = LazySongs(songs_str)
+        playlist.__dates_str = dates_str
+        return playlist
+
+
+if __name__ == "__main__":
+
+    from testdata.songs import *
+    from time import perf_counter
+
+    # Create a lazy playlist from a playlist string
+    pl = Playlist('My songs', *[across_the_universe, imagine, happiness_is_a_warm_gun, love],
+                  created=date(2020, 2, 13), completed=date.today())
+    lpl = LazyPlaylist.from_playlist_str(str(pl))
+    print(lpl.name)
+    print(lpl.songs)
+    print(len(lpl.songs), lpl.songs[-1], lpl.created)
+    print(lpl)
+    print(str(lpl) == str(pl), list(lpl) == list(pl), lpl == LazyPlaylist.from_playlist_str(str(pl)))
+    print()
+
+    # Compare loading a big text archive of playlists with Playlist.from_playlist_str() and lazily,
+    # when only the names and dates, or only the first songs of the playlists are needed
+    playlists = [Playlist(f'Playlist {k}', *[Song(f'Song {k * 500 + i}', i % 2 == 0) for i in range(500)],
+                          created=date(2020, 2, 13)) for k in range(1_000)]
+    archive = [str(p) for p in playlists]
+    for cls in [Playlist, LazyPlaylist]:
+        start = perf_counter()
+        loaded = [cls.from_playlist_str(s) for s in archive]
+        load_time = perf_counter() - start
+        names = [(p.name, p.created, p.completed) for p in loaded]
+        names_time = perf_counter() - start
+        first_songs = [p.songs[:3] for p in loaded]
+        first_songs_time = perf_counter() - start
+        all_songs = sum(len(list(p)) for p in loaded)
+        print(f'{cls.__name__}: load {load_time * 1000:.1f} ms, + names and dates {names_time * 1000:.1f} ms, '
+              f'+ first songs {first_songs_time * 1000:.1f} ms, + all songs {(perf_counter() - start) * 1000:.1f} ms')
+    print([str(s) for s in first_songs[-1]], all_songs)
+    print()
@@ -4,6 +4,7 @@ It includes a list of Song objects and the dates when the playlist was created a
 
 from datetime import date, datetime, time
 from util.utility import *
+from bisect import bisect_left
 import json
 import sys
 import pickle
@@ -11,6 +12,46 @@ import pickle
 from music.song import *
 from util.utility import *
 
+# Order-sensitive polynomial hash of a sequence of songs (see songs_fingerprint())
+FINGERPRINT_BASE = 1_000_003
+FINGERPRINT_MODULUS = 2**61 - 1
+
+
+def song_key(song):
+    """Returns the identity key of the song, (<class>, <data fields>): songs with equal keys are identical
+    (of the same class, with the same data fields), unlike songs that are only equal (==), and equal songs
+    always have equal keys, since songs of different classes are never equal (see the subclasses of Song).
+    The fields are read directly rather than with song.fields(), which is several times slower.
+    """
+
+    return type(song), song.title, song.is_unplugged, getattr(song, 'tempo', None), getattr(song, 'instrument', None)
+
+
+def songs_fingerprint(songs):
+    """Returns the fingerprint of a sequence of songs, the polynomial hash
+    sum(hash(song_key(<song i>)) * FINGERPRINT_BASE**(n - 1 - i)) % FINGERPRINT_MODULUS.
+    Equal sequences of songs have equal fingerprints (equal songs have equal keys), and since the keys include
+    all the data fields (unlike hash(<song>), which covers only the title and is_unplugged), songs that differ
+    only in the tempo or the instrument also change the fingerprint. The fingerprint of a concatenation
+    can be computed from the fingerprints of its parts (see combine_fingerprints()), so it can be maintained
+    incrementally when a sequence is edited in parts.
+    Like hash(), fingerprints of strings (titles) differ between Python processes (see PYTHONHASHSEED),
+    so they should not be stored or sent to other processes.
+    """
+
+    f = 0
+    for s in songs:
+        f = (f * FINGERPRINT_BASE + hash(song_key(s))) % FINGERPRINT_MODULUS
+    return f
+
+
+def combine_fingerprints(f1, f2, n2):
+    """Returns the fingerprint of the concatenation of two sequences of songs with the fingerprints f1 and f2,
+    where n2 is the length of the second sequence.
+    """
+
+    return (f1 * pow(FINGERPRINT_BASE, n2, FINGERPRINT_MODULUS) + f2) % FINGERPRINT_MODULUS
+
 
 class Playlist:
     """The class representing the concept of playlist.
@@ -29,7 +70,8 @@ class Playlist:
         self.songs = songs
         self.created = created
         self.completed = completed
-        # pass                                            # introduce and initialize iterator counter, self.__i
+        self.__index = None                             # built by get_index() on the first lookup
+        self.__songs_fingerprint = None                 # (<songs>, <their fingerprint>), see fingerprint()
 
     def __str__(self):
         n = self.name
@@ -38,7 +80,85 @@ class Playlist:
         return '\n'.join([n, s, from_to])
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__ if type(self) is type(other) else False
+        # Compare only the data fields (not the whole __dict__, which also includes the cached lookup index),
+        # and only if the fingerprints are equal (playlists with different fingerprints cannot be equal)
+        if type(self) is not type(other):
+            return False
+        if self is other:
+            return True
+        if self.fingerprint() != other.fingerprint():
+            return False
+        return (self.name, self.songs, self.created, self.completed) == \
+            (other.name, other.songs, other.created, other.completed)
+
+    def fingerprint(self):
+        """Returns the content fingerprint of the playlist (computed from its name, songs and dates),
+        which is equal for equal playlists and changes when the playlist changes. The fingerprint of the songs
+        is computed once for each self.songs (a tuple, which cannot change, or another immutable sequence of songs)
+        and cached, so it is recomputed only after self.songs has been replaced; a sequence of songs
+        with its own fingerprint() method (such as SongSequence from music.editableplaylist) provides it itself.
+        Use it to check whether a playlist has changed since an earlier point, e.g. since the last sync:
+            synced = pl.fingerprint()
+            ...
+            if pl.fingerprint() != synced: <sync pl>
+        As with get_index(), it is assumed that the songs themselves are not changed in the playlist.
+        Fingerprints are valid only within one Python process (see songs_fingerprint()).
+        """
+
+        if self.__songs_fingerprint is None or self.__songs_fingerprint[0] is not self.songs:
+            f = self.songs.fingerprint() if hasattr(self.songs, 'fingerprint') else songs_fingerprint(self.songs)
+            self.__songs_fingerprint = (self.songs, f)
+        return hash((self.name, self.__songs_fingerprint[1], self.created, self.completed))
+
+    def get_index(self):
+        """Returns the lookup index of the playlist's songs, built on the first call (and rebuilt if self.songs
+        has been replaced since). The index is a dictionary with:
+        - 'titles' - a dictionary of song positions by title, {<title>: [<position>,...]}
+        - 'prefixes' - a list of (<casefolded title>, <position>) tuples, sorted, for binary search by title prefix
+        - 'unplugged' - a tuple of positions of the unplugged songs
+        - 'songs' - the set of songs (songs are hashable), for membership tests
+        It is assumed that the songs themselves are not changed after they are indexed.
+        """
+
+        if self.__index is None or self.__index['indexed'] is not self.songs:
+            titles = {}
+            for i, s in enumerate(self.songs):
+                titles.setdefault(s.title, []).append(i)
+            self.__index = {'indexed': self.songs,
+                            'titles': titles,
+                            'prefixes': sorted((s.title.casefold(), i) for i, s in enumerate(self.songs)),
+                            'unplugged': tuple(i for i, s in enumerate(self.songs) if s.is_unplugged),
+                            'songs': set(self.songs)}
+        return self.__index
+
+    def __contains__(self, song):
+        try:
+            return song in self.get_index()['songs']
+        except TypeError:                               # an unhashable operand, compared with the songs one by one
+            return song in self.songs
+
+    def find(self, title):
+        """Returns the list of songs with the title (in the playlist order), using the lookup index.
+        """
+
+        return [self.songs[i] for i in self.get_index()['titles'].get(title, [])]
+
+    def find_prefix(self, prefix):
+        """Returns the list of songs whose titles start with prefix, case-insensitively (in the playlist order),
+        using binary search over the casefolded titles from the lookup index.
+        """
+
+        prefixes = self.get_index()['prefixes']
+        prefix = prefix.casefold()
+        lo = bisect_left(prefixes, (prefix,))
+        hi = bisect_left(prefixes, (prefix + chr(0x10ffff),), lo)
+        return [self.songs[i] for i in sorted(i for _, i in prefixes[lo:hi])]
+
+    def unplugged(self):
+        """Returns the list of unplugged songs (in the playlist order), using the lookup index.
+        """
+
+        return [self.songs[i] for i in self.get_index()['unplugged']]
 
     @staticmethod
     def is_date_valid(d):
@@ -65,25 +185,18 @@ class Playlist:
         return cls(name, *songs, created=created, completed=completed)
 
     def __iter__(self):
-        """Once __iter__() and __next__() are implemented in a class,
-        we can create an iterator object by calling the iter() built-in function on an object of the class,
-        and then call the next() built-in function on that object.
-        It is often sufficient to just return self in __iter__(),
-        if the iterator counter such as self.__i is introduced and initialized in __init__().
-        Alternatively, the iterator counter (self.__i) is introduced and initialized  here.
+        """Once __iter__() is implemented in a class, we can create an iterator object by calling
+        the iter() built-in function on an object of the class, and then call the next() built-in function
+        on the iterator (which is what a for loop does).
+        One way to do it is to implement __next__() as well, introduce the iterator counter (self.__i),
+        initialize it here and just return self. However, the counter is then shared by all loops over the playlist,
+        so two loops over the same playlist at the same time (nested loops, or loops in different threads)
+        corrupt each other, and each song is returned through a call to the Python method __next__().
+        Instead, a new, independent iterator over the underlying tuple of songs is returned for each loop;
+        it is implemented in C, so iterating over a playlist is as fast as iterating over the tuple itself.
         """
 
-        self.__i = 0
-        return self
-        # return self               # sufficient if the iterator counter is introduced and initialized in __init__()
-
-    def __next__(self):
-        if self.__i < len(self.songs):
-            s = self.songs[self.__i]
-            self.__i += 1
-            return s
-        else:
-            raise StopIteration
+        return iter(self.songs)
 
 
 def next_song(playlist):
@@ -127,29 +240,58 @@ class PlaylistEncoder(json.JSONEncoder):
 
 def playlist_py_to_json(playlist):
     """JSON encoder for Playlist objects (default= parameter in json.dumps()).
+    The songs are encoded as a JSON array of "__Song__" objects, in the same pass as the rest of the playlist
+    (earlier versions embedded them as a separately dumped JSON string, i.e. JSON inside JSON,
+    so every song was serialized and escaped twice; playlist_json_to_py() still accepts that format).
+    The playlists of Playlist subclasses (such as EditablePlaylist) also include the name of their class.
     """
 
     if isinstance(playlist, Playlist):
-        d = playlist.__dict__.copy()
-        d["songs"] = json.dumps(playlist.songs, default=song_py_to_json, indent=4)
-        d["created"] = date_py_to_json(playlist.created)
-        d["completed"] = date_py_to_json(playlist.completed)
+        d = {"name": playlist.name,
+             "songs": [song_py_to_json(s) for s in playlist.songs],
+             "created": date_py_to_json(playlist.created),
+             "completed": date_py_to_json(playlist.completed)}
+        if type(playlist) is not Playlist:
+            d["class"] = type(playlist).__name__
         return {"__Playlist__": d}
     raise TypeError('not a Playlist object')
 
 
+def get_playlist_class(name):
+    """Returns Playlist or its subclass with the name, or Playlist if there is no such class
+    among the subclasses defined so far (e.g. if the module of the subclass has not been imported).
+    """
+
+    classes = [Playlist]
+    for cls in classes:
+        if cls.__name__ == name:
+            return cls
+        classes.extend(cls.__subclasses__())
+    return Playlist
+
+
 def playlist_json_to_py(playlist_json):
     """JSON decoder for Playlist objects (object_hook= parameter in json.loads()).
+    Since json.loads() calls object_hook bottom-up, the "__Song__" objects inside a playlist are decoded here as well,
+    before the enclosing "__Playlist__" object.
+    A playlist with a class name is decoded as an object of that class (see get_playlist_class()).
     """
 
     # The songs field is specified as *songs in Playlist.__init__(),
-    # make sure to use tuple(json.loads(<songs in playlist_json>))
+    # make sure to use tuple(<songs in playlist_json>)
+
+    if "__Song__" in playlist_json:
+        return song_json_to_py(playlist_json)
 
     if "__Playlist__" in playlist_json:
-        p = Playlist('')
         d = playlist_json["__Playlist__"]
+        p = get_playlist_class(d.get("class", "Playlist"))('')
         p.name = d["name"]
-        p.songs = tuple(json.loads(d["songs"], object_hook=song_json_to_py))
+        if isinstance(d["songs"], str):                 # the old format, with songs as a nested JSON string
+            songs = json.loads(d["songs"], object_hook=song_json_to_py)
+        else:
+            songs = d["songs"]
+        p.songs = type(p.songs)(songs)                  # the same kind of sequence as the class uses (e.g. a tuple)
         p.created = date_json_to_py(d["created"])
         p.completed = date_json_to_py(d["completed"])
         return p
@@ -191,9 +333,10 @@ if __name__ == "__main__":
             break
     print()
 
-    # Repeated attempt to run the iterator fails, because the iterator is exhausted
+    # Each iter() call returns a new, independent iterator, so repeated and nested loops work
     i = iter(pl)
     print(next(i))
+    print([(str(s1), str(s2)) for s1 in pl for s2 in pl if s1 != s2][:3])
 
     # Demonstrate generators
     # next_s = next_song(pl)
@@ -321,4 +464,91 @@ if __name__ == "__main__":
         print(p)
     print()
 
+    # Compare the single-pass JSON format of playlists with the old one, with songs as a nested JSON string
+    from timeit import timeit
+    from time import perf_counter
 
+    def playlist_py_to_nested_json(playlist):
+        d = {"name": playlist.name,
+             "songs": json.dumps(playlist.songs, default=song_py_to_json, indent=4),
+             "created": date_py_to_json(playlist.created),
+             "completed": date_py_to_json(playlist.completed)}
+        return {"__Playlist__": d}
+
+    big_pl = Playlist('Big playlist', *[Song(f'Song {i}', i % 2 == 0) for i in range(100_000)],
+                      created=date(2020, 2, 13), completed=date.today())
+    for encoder in [playlist_py_to_nested_json, playlist_py_to_json]:
+        big_pl_json = json.dumps(big_pl, default=encoder)
+        print(f'{encoder.__name__}: {len(big_pl_json)} characters, '
+              f'dumps: {timeit(lambda: json.dumps(big_pl, default=encoder), number=3) / 3:.3f}s, '
+              f'loads: {timeit(lambda: json.loads(big_pl_json, object_hook=playlist_json_to_py), number=3) / 3:.3f}s')
+        print(json.loads(big_pl_json, object_hook=playlist_json_to_py) == big_pl)
+    print()
+
+    # Demonstrate streaming decoding of Song and Playlist objects from JSON files (json_stream() from util.utility)
+    file = get_data_dir() / 'songs.json'
+    with open(file, 'w') as f:
+        json.dump(big_pl.songs, f, default=song_py_to_json)
+    with open(file, 'r') as f:
+        print(sum(1 for s in json_stream(f, object_hook=song_json_to_py) if s.is_unplugged))
+    file = get_data_dir() / 'playlists.json'
+    with open(file, 'w') as f:
+        json.dump([pl, big_pl, pl], f, default=playlist_py_to_json)
+    with open(file, 'rb') as f:
+        for p in json_stream(f, object_hook=playlist_json_to_py):
+            print(f'{p.name}: {len(p.songs)} songs')
+    print()
+
+    # Compare iterating over a playlist, over its tuple of songs, and over a playlist with __next__() and self.__i
+    class CounterPlaylist(Playlist):
+        def __iter__(self):
+            self.__i = 0
+            return self
+
+        def __next__(self):
+            if self.__i < len(self.songs):
+                s = self.songs[self.__i]
+                self.__i += 1
+                return s
+            else:
+                raise StopIteration
+
+    counter_pl = CounterPlaylist('Big playlist', *big_pl.songs, created=date(2020, 2, 13))
+    for name, iterable in [('tuple', big_pl.songs), ('Playlist', big_pl), ('CounterPlaylist', counter_pl)]:
+        print(f'{name}: {timeit(lambda: sum(1 for s in iterable), number=10) / 10 * 1000:.1f} ms')
+    print()
+
+    # Compare the lookups in a big playlist by scanning all songs and using the lookup index
+    # (the index is built on the first lookup)
+    start = perf_counter()
+    big_pl.get_index()
+    print(f'building the index: {(perf_counter() - start) * 1000:.1f} ms')
+    lookups = {'find()': (lambda: [s for s in big_pl.songs if s.title == 'Song 99999'],
+                          lambda: big_pl.find('Song 99999')),
+               'find_prefix()': (lambda: [s for s in big_pl.songs if s.title.casefold().startswith('song 9999')],
+                                 lambda: big_pl.find_prefix('song 9999')),
+               'in': (lambda: Song('Song 99999') in big_pl.songs,
+                      lambda: Song('Song 99999') in big_pl)}
+    for name, (scan, lookup) in lookups.items():
+        print(f'{name}: scan {timeit(scan, number=10) / 10 * 1000:.2f} ms, '
+              f'index {timeit(lookup, number=10) / 10 * 1000:.3f} ms, same result: {scan() == lookup()}')
+    print(len(big_pl.unplugged()))
+    print()
+
+    # Compare equality checks and change detection with and without fingerprints
+    # (a big playlist that differs from big_pl only in its last song; the fingerprints are computed on the first call)
+    changed_pl = Playlist('Big playlist', *[Song(s.title, s.is_unplugged) for s in big_pl.songs[:-1]],
+                          Song('Song 100000'), created=date(2020, 2, 13), completed=date.today())
+    start = perf_counter()
+    changed_pl.fingerprint()
+    print(f'first fingerprint(): {(perf_counter() - start) * 1000:.1f} ms')
+    synced = big_pl.fingerprint()
+    compare_fields = lambda: (big_pl.name, big_pl.songs, big_pl.created, big_pl.completed) == \
+                             (changed_pl.name, changed_pl.songs, changed_pl.created, changed_pl.completed)
+    print(f'==: fields {timeit(compare_fields, number=10) / 10 * 1000:.2f} ms, '
+          f'fingerprints {timeit(lambda: big_pl == changed_pl, number=10) / 10 * 1000:.3f} ms, '
+          f'same result: {compare_fields() == (big_pl == changed_pl)}')
+    print(big_pl.fingerprint() != synced)
+    big_pl.songs = changed_pl.songs
+    print(big_pl.fingerprint() != synced, big_pl == changed_pl)
+    print()
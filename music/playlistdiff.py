@@ -0,0 +1,242 @@
+"""Differences (diffs) between playlists, and patches that apply them, for syncing edited playlists.
+Instead of the whole edited playlist (playlist_py_to_json()), only its patch has to be sent to the other side,
+which already has the previous version of the playlist, so the size of a sync depends on the size of the change,
+not on the size of the playlist.
+
+A patch is a dictionary (keys with nothing to report are left out):
+- 'length' - the number of songs in the old playlist (to check that the patch is applied to the right playlist)
+- 'base' - the checksum of the songs of the old playlist (songs_checksum(), for the same check)
+- 'name', 'created', 'completed' - the new name and the new dates ('YYYY-mm-dd'), if they have changed
+- 'delete' - runs of deleted songs, [[<old position>, <number of songs>],...]
+- 'move' - runs of moved songs, [[<old position>, <new position>, <number of songs>],...]
+- 'insert' - runs of inserted songs, [[<new position>, [<song>,...]],...]
+All the other songs keep their relative order. patch_to_json() and patch_from_json() convert patches to and from
+compact JSON strings, in which each inserted song is a list of its class code, title, is_unplugged, tempo code
+and instrument code (SongTable.song_to_codes(), the same codes as in catalog files, see music.catalog),
+so that songs of all classes (Song, Ballad, PianoSong, PianoBallad) keep their class and fields.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict, deque
+from hashlib import blake2b
+
+from music.playlist import *
+from music.songtable import SongTable
+
+
+def songs_checksum(songs):
+    """Returns the checksum of a sequence of songs, a hex string computed from the codes of the songs
+    (SongTable.song_to_codes()) with BLAKE2b. Unlike fingerprints (see songs_fingerprint() from music.playlist),
+    which are valid only within one Python process, checksums are the same everywhere, so they can be sent
+    with a patch and checked by another process.
+    """
+
+    codes = json.dumps([SongTable.song_to_codes(s) for s in songs], separators=(',', ':'))
+    return blake2b(codes.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def to_runs(positions):
+    """Groups sorted positions (or tuples of positions) into runs of consecutive positions,
+    [[<first position(s)>..., <number of positions>],...].
+    """
+
+    runs = []
+    for p in positions:
+        p = p if isinstance(p, tuple) else (p,)
+        if runs and all(first + runs[-1][-1] == q for first, q in zip(runs[-1], p)):
+            runs[-1][-1] += 1
+        else:
+            runs.append([*p, 1])
+    return runs
+
+
+def diff_playlists(old, new):
+    """Returns the patch (see the module docstring) that turns the old playlist into the new one.
+    The songs of the new playlist are matched with identical songs of the old one (duplicates in their order),
+    and the longest sequence of matched songs that are already in the right order (the longest increasing
+    subsequence of their old positions) stays in place; the other matched songs are moved, the unmatched songs
+    of the old playlist are deleted and those of the new playlist are inserted. This gives the fewest moves
+    for the matching, in O(n log n) time; the common beginning and end of the playlists are skipped in O(n).
+    """
+
+    old_songs, new_songs = tuple(old.songs), tuple(new.songs)    # indexed and sliced, so converted once
+    patch = {'length': len(old_songs), 'base': songs_checksum(old_songs)}
+    if new.name != old.name:
+        patch['name'] = new.name
+    for field in ['created', 'completed']:
+        if getattr(new, field) != getattr(old, field):
+            patch[field] = date_py_to_json(getattr(new, field))
+
+    # The keys of the songs, computed once for each song object (the playlists usually share most of their songs)
+    keys = {}
+
+    def key(song):
+        k = keys.get(id(song))
+        if k is None:
+            k = keys[id(song)] = song_key(song)
+        return k
+
+    # Skip the common beginning and end
+    def same(s1, s2):
+        return s1 is s2 or key(s1) == key(s2)
+
+    start = 0
+    while start < min(len(old_songs), len(new_songs)) and same(old_songs[start], new_songs[start]):
+        start += 1
+    old_end, new_end = len(old_songs), len(new_songs)
+    while old_end > start and new_end > start and same(old_songs[old_end - 1], new_songs[new_end - 1]):
+        old_end, new_end = old_end - 1, new_end - 1
+
+    # Match the songs in the middle: new position -> old position
+    old_positions = defaultdict(deque)
+    for i in range(start, old_end):
+        old_positions[key(old_songs[i])].append(i)
+    matches = {}
+    for j in range(start, new_end):
+        positions = old_positions.get(key(new_songs[j]))
+        if positions:
+            matches[j] = positions.popleft()
+
+    # The longest increasing subsequence of the matched old positions (patience sorting), in new order
+    tails, tail_js, previous = [], [], {}
+    for j, i in matches.items():
+        k = bisect_left(tails, i)
+        previous[j] = tail_js[k - 1] if k else None
+        tails[k:k + 1], tail_js[k:k + 1] = [i], [j]
+    stay = set()
+    j = tail_js[-1] if tail_js else None
+    while j is not None:
+        stay.add(j)
+        j = previous[j]
+
+    matched = set(matches.values())
+    deleted = [i for i in range(start, old_end) if i not in matched]
+    moved = [(i, j) for j, i in matches.items() if j not in stay]
+    inserted = to_runs(j for j in range(start, new_end) if j not in matches)
+    if deleted:
+        patch['delete'] = to_runs(deleted)
+    if moved:
+        patch['move'] = to_runs(moved)
+    if inserted:
+        patch['insert'] = [[j, list(new_songs[j:j + n])] for j, n in inserted]
+    return patch
+
+
+def patch_playlist(playlist, patch):
+    """Returns a new playlist (of the same class as playlist) created by applying the patch to the playlist,
+    in O(n) time; the playlist itself is not changed.
+    Raises PlaylistPatchError if the patch does not fit the playlist.
+    """
+
+    songs = tuple(playlist.songs)                       # sliced once per run of moved songs, so converted once
+    if patch['length'] != len(songs):
+        raise PlaylistPatchError(f'the patch is for {patch["length"]} songs, the playlist has {len(songs)}')
+    if 'base' in patch and patch['base'] != songs_checksum(songs):
+        raise PlaylistPatchError('the patch is for a different playlist (checksum mismatch)')
+    removed = []                                        # old positions
+    placed = []                                         # (new position, song) tuples
+    for i, n in patch.get('delete', []):
+        removed.extend(range(i, i + n))
+    for i, j, n in patch.get('move', []):
+        removed.extend(range(i, i + n))
+        placed.extend(zip(range(j, j + n), songs[i:i + n]))
+    for j, inserted in patch.get('insert', []):
+        placed.extend(zip(range(j, j + len(inserted)), inserted))
+    n_new = len(songs) - len(removed) + len(placed)
+    if len(set(removed)) != len(removed) or len({j for j, _ in placed}) != len(placed):
+        raise PlaylistPatchError('song position deleted, moved or inserted more than once')
+    removed, placed = set(removed), dict(placed)
+    if not removed <= set(range(len(songs))) or not placed.keys() <= set(range(n_new)):
+        raise PlaylistPatchError('song position out of range')
+
+    kept = (s for i, s in enumerate(songs) if i not in removed)
+    try:
+        new_songs = [placed[j] if j in placed else next(kept) for j in range(n_new)]
+    except StopIteration:
+        raise PlaylistPatchError('song position out of range') from None
+    if len(new_songs) != n_new or next(kept, None) is not None:
+        raise PlaylistPatchError('song position out of range')
+
+    created = date_json_to_py(patch['created']) if 'created' in patch else playlist.created
+    completed = date_json_to_py(patch['completed']) if 'completed' in patch else playlist.completed
+    return type(playlist)(patch.get('name', playlist.name), *new_songs, created=created, completed=completed)
+
+
+def patch_to_json(patch):
+    patch = dict(patch)
+    if 'insert' in patch:
+        patch['insert'] = [[j, [SongTable.song_to_codes(s) for s in inserted]] for j, inserted in patch['insert']]
+    return json.dumps(patch, separators=(',', ':'))
+
+
+def patch_from_json(patch_json):
+    patch = json.loads(patch_json)
+    if 'insert' in patch:
+        patch['insert'] = [[j, [SongTable.song_from_codes(*codes) for codes in inserted]]
+                           for j, inserted in patch['insert']]
+    return patch
+
+
+class PlaylistPatchError(PlaylistError):
+    """Exception raised when a patch cannot be applied to a playlist (it was computed for a different playlist).
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+
+if __name__ == "__main__":
+
+    from testdata.songs import *
+    from time import perf_counter
+
+    # Diff and patch a small playlist
+    pl = Playlist('My songs', *[across_the_universe, imagine, happiness_is_a_warm_gun, love],
+                  created=date(2020, 2, 13), completed=date(2020, 3, 1))
+    edited = Playlist('My favorite songs', *[love, across_the_universe, happiness_is_a_warm_gun, Song('Help!')],
+                      created=date(2020, 2, 13), completed=date.today())
+    patch = diff_playlists(pl, edited)
+    print(patch_to_json(patch))
+    patched = patch_playlist(pl, patch_from_json(patch_to_json(patch)))
+    print(patched)
+    print(patched == edited)
+    print()
+
+    # Compare syncing an edited big playlist with the whole playlist in JSON and with a patch
+    songs = [Song(f'Song {i}', i % 2 == 0) for i in range(100_000)]
+    big_pl = Playlist('Big playlist', *songs, created=date(2020, 2, 13))
+    edited_songs = songs[:10] + songs[20:50_000] + [Song('New song')] + songs[50_000:99_000] + songs[10:20] + \
+        songs[99_000:]
+    edited_songs[70_000] = Song('Another new song', True)
+    big_edited = Playlist('Big playlist', *edited_songs, created=date(2020, 2, 13))
+    start = perf_counter()
+    patch_json = patch_to_json(diff_playlists(big_pl, big_edited))
+    print(f'diff_playlists(): {(perf_counter() - start) * 1000:.1f} ms')
+    start = perf_counter()
+    patched = patch_playlist(big_pl, patch_from_json(patch_json))
+    print(f'patch_playlist(): {(perf_counter() - start) * 1000:.1f} ms')
+    print(patched == big_edited)
+    print(f'patch: {len(patch_json)} characters, '
+          f'playlist: {len(json.dumps(big_edited, default=playlist_py_to_json))} characters')
+    print(patch_json)
+    print()
+
+    # Songs of all classes keep their class and fields in the patch
+    ballads = Playlist('Ballads', imagine, created=date(2021, 3, 1))
+    edited_ballads = Playlist('Ballads', Ballad(title='Right Before My Eyes', is_unplugged=True), imagine,
+                              PianoBallad(title='Jealous Guy', tempo=Tempo.MODERATE), created=date(2021, 3, 1))
+    patch_json = patch_to_json(diff_playlists(ballads, edited_ballads))
+    print(patch_json)
+    print(patch_playlist(ballads, patch_from_json(patch_json)) == edited_ballads)
+    print()
+
+    # A patch cannot be applied to a different playlist, and a malformed patch is rejected
+    for playlist, patch in [(pl, patch_from_json(patch_json)),
+                            (pl, {'length': 4, 'base': songs_checksum([love] * 4)}),
+                            (pl, {'length': 4, 'insert': [[0, [imagine]], [0, [love]]]}),
+                            (pl, {'length': 4, 'delete': [[0, 2]], 'move': [[1, 0, 1]]})]:
+        try:
+            patch_playlist(playlist, patch)
+        except PlaylistPatchError as e:
+            print(e.__class__.__name__ + ': ' + e.message)
+    print()
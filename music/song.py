@@ -5,6 +5,7 @@
 # from util import utility
 from music.enums import *
 import json
+import weakref
 
 
 class Song:
@@ -20,8 +21,23 @@ class Song:
     - __dict__ attribute of all objects
     - data fields (instance variables)
     - methods - calling them by self.<method>(...) from the same class where they are defined
+    - __slots__ (no per-instance __dict__, which makes large collections of songs much more compact in memory)
+
+    All data fields of the Song hierarchy are declared as slots here, in the base class.
+    Ballad and PianoSong cannot declare their own non-empty slots, because PianoBallad inherits from both of them
+    and Python does not allow multiple bases with different instance layouts ("instance lay-out conflict",
+    see https://docs.python.org/3/reference/datamodel.html#slots). The subclasses just declare empty __slots__,
+    which is still necessary - otherwise each of their instances would get a __dict__ again.
+    A slot that is never set simply does not exist for the object (e.g., Song('Imagine').tempo raises AttributeError).
     """
 
+    # '__weakref__' makes songs weakly referenceable (for the intern table); it is not a data field
+    __slots__ = ('__title', 'is_unplugged', 'tempo', 'instrument', '__weakref__')
+
+    # The intern table of intern(): (<class>, <data fields>) -> song; it holds the songs only weakly,
+    # so a song is removed from it as soon as it is not used anywhere else
+    interned = weakref.WeakValueDictionary()
+
     def __init__(self, title, is_unplugged=False):
         self.title = title
         self.is_unplugged = is_unplugged
@@ -48,15 +64,45 @@ class Song:
 
     # Add an immutable property (no setter for it) - just return self; prints as __str__().
 
+    def fields(self):
+        """Returns the data fields of the song as a dictionary, much like the __dict__ attribute of objects
+        that do not use __slots__. The keys are the actual attribute names (including the name-mangled _Song__title),
+        and only the slots that are set are included.
+        """
+
+        names = [f'_Song{name}' if name.startswith('__') else name for name in Song.__slots__ if name != '__weakref__']
+        return {name: getattr(self, name) for name in names if hasattr(self, name)}
+
     def __str__(self):
         return f'{self.title}' if not self.is_unplugged else f'{self.title} (unplugged)'
 
     def __eq__(self, other):
         isi = isinstance(other, Song)
-        t = self.title == other.title
-        u = self.is_unplugged == other.is_unplugged
+        t = isi and self.title == other.title
+        u = isi and self.is_unplugged == other.is_unplugged
         return isi and t and u
 
+    def __hash__(self):
+        """Makes songs usable in sets and as dictionary keys (defining __eq__() alone sets __hash__ to None).
+        Equal objects must have equal hashes, and a Song is equal to any object of a Song subclass
+        with the same title and is_unplugged, so the hash depends only on these two fields (in all subclasses).
+        The hash changes if these fields are changed, so a song should not be changed while it is in a set or a dict.
+        """
+
+        return hash((self.title, self.is_unplugged))
+
+    def intern(self):
+        """Returns the song from the intern table (Song.interned) that is identical to this one
+        (of the same class, with the same data fields), after adding this song to the table if there is no such song.
+        Using interned songs, all identical songs in a large catalog are one and the same object.
+        The table does not keep the songs alive (see Song.interned), and Song.interned.clear() empties it.
+        An interned song is shared by everyone who has interned an identical song, so it must not be changed:
+        changing it would change all of its "copies", and its key in the table would no longer match its fields
+        (change a copy instead, e.g. Song(<interned song>.title, ...), and intern that one if needed).
+        """
+
+        return Song.interned.setdefault((type(self), tuple(self.fields().items())), self)
+
     def play(self, artist, *args, **kwargs):
         """Assumes that artist, *args (e.g. expressions of gratitude) and kwargs.values() (e.g. messages) are strings.
         Prints song title, artist, and things like rhythm counts, expressions of gratitude and messages. A call example:
@@ -85,10 +131,26 @@ class Song:
         """
 
         # return f'{self.title}' if not self.is_unplugged else f'{self.title} (unplugged)'
-        t = song_string.split(' (unplugged)')[0]
-        u = True if song_string.endswith(' (unplugged)') else False
+        u = song_string.endswith(' (unplugged)')
+        t = song_string[:-len(' (unplugged)')] if u else song_string
         return cls(t, u)
 
+    @classmethod
+    def from_lines(cls, lines):
+        """Generator that converts song strings in the format generated by __str__(), one per line,
+        into songs, in a single pass. lines can be any iterable of strings, including an open text file
+        (so the songs are parsed while the file is read, and only one line is in memory at a time).
+        See also SongTable.from_lines() from music.songtable, which parses the lines directly into columns.
+        """
+
+        suffix = ' (unplugged)'
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.endswith(suffix):
+                yield cls(line[:-len(suffix)], True)
+            else:
+                yield cls(line)
+
 
 class SongEncoder(json.JSONEncoder):
     """JSON encoder for Song objects (cls= parameter in json.dumps()).
@@ -108,7 +170,7 @@ def song_py_to_json(song):
 
     # recommendation: always use double quotes with JSON
     if isinstance(song, Song):
-        return {"__Song__": song.__dict__}
+        return {"__Song__": song.fields()}
     raise TypeError('expected Song object')
 
 
@@ -125,7 +187,8 @@ def song_json_to_py(song_json):
 
     if "__Song__" in song_json:
         s = Song('')
-        s.__dict__.update(song_json["__Song__"])
+        for name, value in song_json["__Song__"].items():
+            setattr(s, name, value)
         return s
     return song_json
 
@@ -139,6 +202,8 @@ class Ballad(Song):
     https://stackoverflow.com/questions/3394835/use-of-args-and-kwargs/3394902#3394902 (calling super() in constructors)
     """
 
+    __slots__ = ()
+
     # # Version 1 - no multiple inheritance
     # def __init__(self, title, is_unplugged=False, tempo=Tempo.SLOW):
     #     super().__init__(title, is_unplugged)
@@ -159,7 +224,9 @@ class Ballad(Song):
         #     return self.__dict__ == other.__dict__
         # return False
 
-        return self.__dict__ == other.__dict__ if type(self) is type(other) else False
+        return self.fields() == other.fields() if type(self) is type(other) else False
+
+    __hash__ = Song.__hash__                                # overriding __eq__() sets __hash__ to None
 
     def play(self, artist, *args, **kwargs):
         """Assumes that artist, *args (e.g. expressions of gratitude) and kwargs.values() (e.g. messages) are strings.
@@ -177,6 +244,8 @@ class PianoSong(Song):
     in which the dominating instrument is piano.
     """
 
+    __slots__ = ()
+
     # # Version 1 - no multiple inheritance
     # def __init__(self, title, is_unplugged=False, instrument=Instrument.PIANO):
     #     super().__init__(title, is_unplugged)
@@ -197,7 +266,9 @@ class PianoSong(Song):
         #     return self.__dict__ == other.__dict__
         # return False
 
-        return self.__dict__ == other.__dict__ if type(self) is type(other) else False
+        return self.fields() == other.fields() if type(self) is type(other) else False
+
+    __hash__ = Song.__hash__                                # overriding __eq__() sets __hash__ to None
 
     def details(self):
         """Just a simple method to indicate details of a piano song.
@@ -216,6 +287,8 @@ class PianoBallad(Ballad, PianoSong):
     https://stackoverflow.com/a/533675/1899061 (mixins explained, and what good they are in multiple inheritance)
     """
 
+    __slots__ = ()
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
@@ -229,7 +302,9 @@ class PianoBallad(Ballad, PianoSong):
         #     return self.__dict__ == other.__dict__
         # return False
 
-        return self.__dict__ == other.__dict__ if type(self) is type(other) else False
+        return self.fields() == other.fields() if type(self) is type(other) else False
+
+    __hash__ = Song.__hash__                                # overriding __eq__() sets __hash__ to None
 
 
 if __name__ == "__main__":
@@ -262,8 +337,12 @@ if __name__ == "__main__":
     #   1. <object>.<new_attr> = <value>
     #   2. <object>.__setattr__('<new_attr>', <value>)      # counterpart: <object>.__getattribute__('<attr>')
     #   3. setattr(<object>, '<new_attr>', <value>))        # counterpart: getattr(<object>, '<attr>')
-    imagine.year = 1971
-    print(imagine.year)
+    # Song objects use __slots__, so new data fields cannot be added to them (AttributeError)
+    try:
+        imagine.year = 1971
+        print(imagine.year)
+    except AttributeError as e:
+        print(e)
     print()
 
     # Calling methods
@@ -282,7 +361,8 @@ if __name__ == "__main__":
 
     # Demonstrate object data fields and methods for Song objects
     print(imagine.__dir__())
-    print(imagine.__dict__)
+    # print(imagine.__dict__)                               # AttributeError - Song objects use __slots__
+    print(imagine.fields())
     print()
 
     # Demonstrate @classmethod (from_str())
@@ -339,3 +419,48 @@ if __name__ == "__main__":
     print('; '.join([str(s) for s in songs_py]))
     print()
 
+    # Demonstrate the memory footprint of slotted Song objects vs. Song objects with a per-instance __dict__
+    # (the latter are objects of DictSong, a plain copy of Song without __slots__, as Song was before using them)
+    import tracemalloc
+
+    class DictSong:
+        def __init__(self, title, is_unplugged=False):
+            self.title = title
+            self.is_unplugged = is_unplugged
+
+        @property
+        def title(self):
+            return self.__title
+
+        @title.setter
+        def title(self, title):
+            self.__title = title if isinstance(title, str) else 'unknown'
+
+    titles = [f'Song {i}' for i in range(100_000)]
+    for song_class in [DictSong, Song]:
+        tracemalloc.start()
+        catalog = [song_class(title, i % 2 == 0) for i, title in enumerate(titles)]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{song_class.__name__}: {size / len(catalog):.1f} bytes per song')
+        del catalog
+    print()
+
+    # Demonstrate hashing - deduplicating songs and membership tests in sets
+    print(len({imagine, Song('Imagine'), Song('Imagine'), love}))
+    print(Song('Love', True) in {imagine, love})
+    print(hash(Ballad(title='Imagine')) == hash(Song('Imagine')))
+    print()
+
+    # Demonstrate interning songs - compare the memory used by a catalog with and without interning
+    for intern in [False, True]:
+        Song.interned.clear()
+        tracemalloc.start()
+        songs = (Song(titles[i % 1000], i % 2 == 0) for i in range(100_000))
+        catalog = [s.intern() for s in songs] if intern else list(songs)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'intern={intern}: {size / len(catalog):.1f} bytes per song, {len(set(map(id, catalog)))} objects')
+        del catalog
+    print(len(Song.interned))                           # the interned songs are gone with the catalog
+    print()
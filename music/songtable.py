@@ -0,0 +1,277 @@
+"""Columnar storage of large collections of songs.
+Instead of a list of Song objects, a SongTable keeps one column per data field:
+- titles - a pool of title strings (equal titles share one str object)
+- kinds - the class of each song (Song, Ballad, PianoSong, PianoBallad), as a small integer code
+- unplugged - 0/1 flags
+- tempos, instruments - enum codes (0 if the song has no tempo/instrument)
+All columns except titles are bytearrays, so queries run over them in C (bytes.translate(), bytes.count(),
+int bitwise operators,...), much like vectorized operations in NumPy, and never create Song objects.
+Queries return masks (bytes objects with one 0/1 byte per row), which can be combined and then used to
+count, select or materialize the matching rows.
+"""
+
+
+from itertools import compress
+from bisect import bisect_left
+
+from music.song import *
+
+
+class SongTable:
+    """The class representing a column-oriented table of songs.
+    Songs are converted to columns when they are added to the table, and materialized back to
+    Song/Ballad/PianoSong/PianoBallad objects only when explicitly requested (to_songs(), table[i], iteration).
+    """
+
+    song_classes = (Song, Ballad, PianoSong, PianoBallad)
+    all_tempos = tuple(Tempo)
+    all_instruments = tuple(Instrument)
+
+    def __init__(self, songs=()):
+        self.titles = []
+        self.kinds = bytearray()
+        self.unplugged = bytearray()
+        self.tempos = bytearray()
+        self.instruments = bytearray()
+        self.__pool = {}
+        self.__title_order = None
+        self.__sorted_titles = None
+        for song in songs:
+            self.append(song)
+
+    # Alternative constructor
+    @classmethod
+    def from_lines(cls, lines):
+        """Returns a SongTable made from song strings in the format generated by Song.__str__(), one per line
+        (e.g. an open text file), without creating any Song objects - each line is split into the title
+        and the unplugged flag in a single pass, and they are appended to the columns directly.
+        """
+
+        table = cls()
+        suffix = ' (unplugged)'
+        pool = table.__pool
+        titles = table.titles
+        unplugged = table.unplugged
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.endswith(suffix):
+                line = line[:-len(suffix)]
+                unplugged.append(1)
+            else:
+                unplugged.append(0)
+            titles.append(pool.setdefault(line, line))
+        table.kinds = bytearray(len(titles))
+        table.tempos = bytearray(len(titles))
+        table.instruments = bytearray(len(titles))
+        return table
+
+    # Song codes, shared with the other compact formats of songs (music.catalog, music.playlistdiff)
+
+    @classmethod
+    def song_to_codes(cls, song):
+        """Returns the (class code, title, is_unplugged, tempo code, instrument code) tuple of the song:
+        the class code is the position of the song's class in song_classes, and the tempo and instrument codes
+        are the positions in all_tempos and all_instruments + 1, or 0 if the song has no tempo/instrument.
+        """
+
+        if type(song) not in cls.song_classes:
+            raise TypeError('expected Song, Ballad, PianoSong or PianoBallad object')
+        return (cls.song_classes.index(type(song)), song.title, song.is_unplugged,
+                cls.all_tempos.index(song.tempo) + 1 if hasattr(song, 'tempo') else 0,
+                cls.all_instruments.index(song.instrument) + 1 if hasattr(song, 'instrument') else 0)
+
+    @classmethod
+    def song_from_codes(cls, kind, title, is_unplugged, tempo, instrument):
+        """Inverted song_to_codes(): returns the song with the codes, without calling the constructor of its class.
+        """
+
+        song_class = cls.song_classes[kind]
+        song = song_class.__new__(song_class)
+        song.title = title
+        song.is_unplugged = bool(is_unplugged)
+        if tempo:
+            song.tempo = cls.all_tempos[tempo - 1]
+        if instrument:
+            song.instrument = cls.all_instruments[instrument - 1]
+        return song
+
+    def __len__(self):
+        return len(self.titles)
+
+    def __getitem__(self, row):
+        return self.song_from_codes(self.kinds[row], self.titles[row], self.unplugged[row],
+                                    self.tempos[row], self.instruments[row])
+
+    def __iter__(self):
+        return (self[row] for row in range(len(self)))
+
+    def __str__(self):
+        return '; '.join([str(song) for song in self]) if len(self) else '(empty)'
+
+    def append(self, song):
+        """Adds a song to the table, converting it to one entry in each of the columns.
+        """
+
+        kind, title, is_unplugged, tempo, instrument = self.song_to_codes(song)
+        self.titles.append(self.__pool.setdefault(title, title))
+        self.kinds.append(kind)
+        self.unplugged.append(1 if is_unplugged else 0)
+        self.tempos.append(tempo)
+        self.instruments.append(instrument)
+        self.__title_order = None
+
+    def to_songs(self, rows=None):
+        """Materializes the songs from the specified rows (all rows by default) as a list of Song objects.
+        """
+
+        return [self[row] for row in (range(len(self)) if rows is None else rows)]
+
+    # Queries - each of them returns a mask, i.e. a bytes object with one 0/1 byte per row
+
+    @staticmethod
+    def equal_mask(column, code):
+        """Returns the mask of the rows in which the column (a bytearray) holds the code.
+        """
+
+        table = bytearray(256)
+        table[code] = 1
+        return column.translate(table)
+
+    def is_unplugged(self):
+        return bytes(self.unplugged)
+
+    def has_tempo(self, tempo):
+        return self.equal_mask(self.tempos, self.all_tempos.index(tempo) + 1)
+
+    def has_instrument(self, instrument):
+        return self.equal_mask(self.instruments, self.all_instruments.index(instrument) + 1)
+
+    def is_kind(self, song_class):
+        return self.equal_mask(self.kinds, self.song_classes.index(song_class))
+
+    def title_starts_with(self, prefix):
+        """Returns the mask of the rows in which the title starts with prefix.
+        Uses binary search over the titles sorted alphabetically (the sorted order is built on the first query
+        and cached until the table changes), so only the matching rows are ever visited.
+        """
+
+        if self.__title_order is None:
+            self.__title_order = sorted(range(len(self)), key=self.titles.__getitem__)
+            self.__sorted_titles = [self.titles[row] for row in self.__title_order]
+        lo = bisect_left(self.__sorted_titles, prefix)
+        hi = bisect_left(self.__sorted_titles, prefix + chr(0x10ffff), lo)
+        mask = bytearray(len(self))
+        for row in self.__title_order[lo:hi]:
+            mask[row] = 1
+        return bytes(mask)
+
+    # Operations on masks
+
+    @staticmethod
+    def mask_and(mask1, mask2):
+        n = len(mask1)
+        return (int.from_bytes(mask1, 'little') & int.from_bytes(mask2, 'little')).to_bytes(n, 'little')
+
+    @staticmethod
+    def mask_or(mask1, mask2):
+        n = len(mask1)
+        return (int.from_bytes(mask1, 'little') | int.from_bytes(mask2, 'little')).to_bytes(n, 'little')
+
+    @staticmethod
+    def mask_not(mask):
+        return mask.translate(bytes([1, 0]) + bytes(254))
+
+    @staticmethod
+    def count(mask):
+        return mask.count(1)
+
+    @staticmethod
+    def rows(mask):
+        """Returns the list of row numbers selected by the mask.
+        """
+
+        return list(compress(range(len(mask)), mask))
+
+    # Derived tables
+
+    def take(self, rows):
+        """Returns a new SongTable with the specified rows, in the specified order.
+        """
+
+        table = SongTable()
+        table.titles = [self.titles[row] for row in rows]
+        table.kinds = bytearray([self.kinds[row] for row in rows])
+        table.unplugged = bytearray([self.unplugged[row] for row in rows])
+        table.tempos = bytearray([self.tempos[row] for row in rows])
+        table.instruments = bytearray([self.instruments[row] for row in rows])
+        table.__pool = self.__pool
+        return table
+
+    def select(self, mask):
+        return self.take(self.rows(mask))
+
+    def argsort(self, by='title', reverse=False):
+        """Returns the row numbers in the order of the specified column
+        ('title', 'kind', 'unplugged', 'tempo' or 'instrument').
+        """
+
+        if by == 'title' and not reverse and self.__title_order is not None:
+            return self.__title_order[:]
+        columns = {'title': self.titles, 'kind': self.kinds, 'unplugged': self.unplugged,
+                   'tempo': self.tempos, 'instrument': self.instruments}
+        return sorted(range(len(self)), key=columns[by].__getitem__, reverse=reverse)
+
+    def sort(self, by='title', reverse=False):
+        return self.take(self.argsort(by, reverse))
+
+
+if __name__ == "__main__":
+
+    from testdata.songs import *
+
+    # Build a table and materialize it back to Song objects
+    songs = [imagine, across_the_universe, happiness_is_a_warm_gun, love,
+             Ballad(title='Right Before My Eyes', is_unplugged=True),
+             PianoSong(title='Let It Be'),
+             PianoBallad(title='Jealous Guy', tempo=Tempo.MODERATE)]
+    table = SongTable(songs)
+    print(table)
+    print(table.to_songs() == songs)
+    print()
+
+    # Queries
+    print(table.select(table.is_unplugged()))
+    print(table.count(table.has_instrument(Instrument.PIANO)))
+    print(table.rows(table.mask_and(table.title_starts_with('Ha'), table.mask_not(table.is_unplugged()))))
+    print(table.sort())
+    print()
+
+    # Compare filtering a list of Song objects and filtering a SongTable
+    from timeit import timeit
+
+    catalog = [Song(f'{title} {i}', i % 3 == 0) for i in range(100_000)
+               for title in ['Imagine', 'Love', 'Help']]
+    catalog_table = SongTable(catalog)
+    print(timeit(lambda: len([s for s in catalog if s.is_unplugged and s.title.startswith('Love')]), number=10))
+    print(timeit(lambda: catalog_table.count(catalog_table.mask_and(catalog_table.is_unplugged(),
+                                                                    catalog_table.title_starts_with('Love'))),
+                 number=10))
+    print()
+
+    # Compare the throughput of parsing a file of song strings with Song.from_str(), Song.from_lines()
+    # and SongTable.from_lines()
+    from time import perf_counter
+    from util.utility import get_data_dir
+
+    file = get_data_dir() / 'songs.txt'
+    with open(file, 'w') as f:
+        f.writelines([str(s) + '\n' for s in catalog * 4])
+    parsers = {'Song.from_str()': lambda f: [Song.from_str(line.rstrip('\n')) for line in f],
+               'Song.from_lines()': lambda f: list(Song.from_lines(f)),
+               'SongTable.from_lines()': lambda f: SongTable.from_lines(f)}
+    for name, parse in parsers.items():
+        with open(file, 'r') as f:
+            start = perf_counter()
+            n = len(parse(f))
+            print(f'{name}: {n / (perf_counter() - start) / 10**6:.2f}M lines/s')
+    print()
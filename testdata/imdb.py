@@ -0,0 +1,221 @@
+"""Test data for the crawler (music.crawl): IMDb-like movie list pages and a local HTTP server that serves them.
+The pages mimic the structure of IMDb keyword search results (see the notes at the end of music/crawl.py),
+so the crawler can be run and measured without accessing the Internet. A typical use:
+    server = start_server()
+    start_url = get_start_url(server)
+    ...
+    server.shutdown()
+"""
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from collections import deque
+import threading
+import random
+import time
+import re
+
+MOVIES_PER_PAGE = 50
+PAGES = 10
+
+
+def imdb_page(page, movies_per_page=MOVIES_PER_PAGE):
+    """Returns the HTML text of a page of an IMDb-like movie list.
+    Each movie is a 'lister-item mode-detail' div, with the poster link in the 'loadlate' attribute of the img tag
+    and with the title, the year and the movie link in the 'h3' tag. Like on IMDb, there is one more 'h3' tag
+    after the list.
+    """
+
+    items = []
+    for i in range((page - 1) * movies_per_page + 1, page * movies_per_page + 1):
+        year = f'({1950 + i % 70})' if i % 10 else f'(video, {1950 + i % 70})'
+        items.append(f'''
+<div class="lister-item mode-detail">
+    <div class="lister-item-image ribbonize" data-tconst="tt{i:07d}">
+        <a href="/title/tt{i:07d}/">
+            <img alt="Movie {i}" class="loadlate" loadlate="/posters/tt{i:07d}.jpg" src="/images/nopicture.png"/>
+        </a>
+    </div>
+    <div class="lister-item-content">
+        <h3 class="lister-item-header">
+            <span class="lister-item-index unbold text-primary">{i}.</span>
+            <a href="/title/tt{i:07d}/">Movie {i}</a>
+            <span class="lister-item-year text-muted unbold">{year}</span>
+        </h3>
+        <p class="text-muted">Rock 'n' roll movie number {i}, with some more text about the plot and the cast.</p>
+    </div>
+</div>''')
+    return f'''<!DOCTYPE html>
+<html>
+<head><title>Rock 'n' roll movies - page {page}</title></head>
+<body>
+<div id="wrapper"><div id="root"><div id="pagecontent"><div id="main">
+<div class="lister list detail sub-list"><div class="lister-list">{''.join(items)}
+</div></div>
+<h3>Recently Viewed</h3>
+</div></div></div></div>
+</body>
+</html>
+'''
+
+
+def movie_page(movie, movies=PAGES * MOVIES_PER_PAGE):
+    """Returns the HTML text of the IMDb-like page of a movie, with the links to the pages of 3 other movies
+    (out of the total number of movies), like the 'More like this' section on IMDb.
+    """
+
+    related = [(movie * k) % movies + 1 for k in [2, 3, 7]]
+    links = ''.join([f'\n    <a href="/title/tt{r:07d}/">Movie {r}</a>' for r in related])
+    return f'''<!DOCTYPE html>
+<html>
+<head><title>Movie {movie}</title></head>
+<body>
+<h1>Movie {movie}</h1>
+<div class="more-like-this">{links}
+</div>
+</body>
+</html>
+'''
+
+
+def poster(movie):
+    """Returns the bytes of a fake poster image of a movie (20-120 KB, depending on the movie number).
+    """
+
+    return bytes(range(256)) * (80 + movie % 400)
+
+
+class IMDbRequestHandler(BaseHTTPRequestHandler):
+    """Serves the pages generated by imdb_page() at /search/keyword/?...&page=<n>&...,
+    the pages generated by movie_page() at /title/tt<7-digit movie number>/,
+    and the posters generated by poster() at /posters/tt<7-digit movie number>.jpg, using HTTP/1.1 keep-alive.
+    Each page has an ETag that depends on server.version (increase it to simulate changed pages),
+    and conditional requests with a matching If-None-Match header get 304 Not Modified.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.server.is_throttled():
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            self.send_error(503)
+            return
+        path = urlsplit(self.path).path
+        movies = self.server.pages * MOVIES_PER_PAGE
+        if path.startswith('/search/keyword'):
+            page = int(parse_qs(urlsplit(self.path).query).get('page', ['1'])[0])
+            if not 1 <= page <= self.server.pages:
+                self.send_error(404)
+                return
+            etag = f'"page-{page}-v{self.server.version}"'
+            fixture = self.server.fixture_dir / f'page_{page}.html' if self.server.fixture_dir else None
+            if fixture and fixture.exists():
+                get_body = lambda: fixture.read_bytes()
+            else:
+                get_body = lambda: imdb_page(page).encode('utf-8')
+        elif re.fullmatch(r'/title/tt\d{7}/', path) and 1 <= int(path[9:16]) <= movies:
+            movie = int(path[9:16])
+            etag = f'"movie-{movie}-v{self.server.version}"'
+            get_body = lambda: movie_page(movie, movies).encode('utf-8')
+        elif re.fullmatch(r'/posters/tt\d{7}\.jpg', path) and 1 <= int(path[11:18]) <= movies:
+            movie = int(path[11:18])
+            etag = f'"poster-{movie}-v{self.server.version}"'
+            get_body = lambda: poster(movie)
+        else:
+            self.send_error(404)
+            return
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = get_body()
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'image/jpeg' if path.startswith('/posters') else 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.server.bandwidth:                       # send the body in 10 chunks per second
+            chunk_size = max(1, self.server.bandwidth // 10)
+            for i in range(0, len(body), chunk_size):
+                self.wfile.write(body[i:i + chunk_size])
+                time.sleep(0.1)
+        else:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class IMDbServer(ThreadingHTTPServer):
+    """Local IMDb-like HTTP server that also counts the connections it has accepted
+    (to check whether the clients reuse their connections).
+    The latency (in seconds) is added to the response time of each request, to simulate a remote server.
+    If rate_limit is set, the server responds with 429 Too Many Requests (and Retry-After: 1)
+    to the requests exceeding rate_limit requests in the last second.
+    If bandwidth is set, the responses are sent at bandwidth bytes per second.
+    The error_rate is the probability of responding to a request with 503 Service Unavailable.
+    If fixture_dir is set, the list pages saved in it as page_<n>.html (e.g. real IMDb pages) are served
+    instead of the pages generated by imdb_page().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, pages=PAGES, latency=0, rate_limit=None,
+                 bandwidth=None, error_rate=0, fixture_dir=None):
+        super().__init__(server_address, IMDbRequestHandler)
+        self.pages = pages
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.fixture_dir = fixture_dir
+        self.version = 1
+        self.connections = 0
+        self.throttled = 0
+        self.__recent = deque()
+        self.__lock = threading.Lock()
+
+    def is_throttled(self):
+        if self.rate_limit is None:
+            return False
+        with self.__lock:
+            now = time.monotonic()
+            while self.__recent and now - self.__recent[0] > 1:
+                self.__recent.popleft()
+            if len(self.__recent) >= self.rate_limit:
+                self.throttled += 1
+                return True
+            self.__recent.append(now)
+            return False
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def start_server(pages=PAGES, latency=0, rate_limit=None, bandwidth=None, error_rate=0, fixture_dir=None, port=0):
+    """Starts the local IMDb-like HTTP server in a background thread and returns the server object
+    (port=0 means any free port; call <server>.shutdown() to stop the server).
+    See IMDbServer for the other parameters.
+    """
+
+    server = IMDbServer(('127.0.0.1', port), pages, latency, rate_limit, bandwidth, error_rate, fixture_dir)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get_start_url(server):
+    """Returns the URL of the first page of the movie list served by the server, in the format used by IMDb.
+    """
+
+    host, port = server.server_address
+    return f'http://{host}:{port}/search/keyword/?keywords=rock-%27n%27-roll%2Crock-music&ref_=kw_ref_key&' \
+           f'mode=detail&page=1&sort=moviemeter,asc'
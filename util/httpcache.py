@@ -0,0 +1,188 @@
+"""Persistent HTTP response cache, used by the crawler (music.crawl) to avoid downloading unchanged pages again.
+"""
+
+from collections import OrderedDict
+from hashlib import sha1
+import json
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from util import utility
+
+
+class CachedSession(requests.Session):
+    """requests.Session that keeps the bodies of successful GET responses in files in cache_dir
+    (<data dir>/http_cache by default), keyed by URL.
+    - A response younger than ttl seconds is returned from the cache, without any request (a hit).
+    - An older response is revalidated with a conditional request (If-None-Match/If-Modified-Since, using
+      the ETag/Last-Modified headers of the cached response); if the server responds with 304 Not Modified,
+      the cached response is returned (a revalidation), otherwise the new response is cached (a miss).
+      A response without ETag/Last-Modified is simply requested again when it gets older than ttl.
+    - When the total size of the cached bodies exceeds max_size bytes, the least recently used ones are removed.
+    The index of the cache (URL -> headers, time stored, size) is kept in index.jsonl, a log to which each change
+    of an entry (store, revalidation, removal) is appended as a line, so updating it costs the same regardless of
+    the number of entries; the log is compacted (rewritten with only the current entries) when it gets more than
+    twice as long as necessary, and when the session is closed (close(), or with <session> as a context manager).
+    Since it is a requests.Session, it can be passed to the crawler functions instead of the shared session.
+    It can be used by multiple threads at the same time (e.g. get_m_info(..., concurrency=10)); a body removed
+    from the cache by another thread while its entry is being used is treated as a miss.
+    """
+
+    def __init__(self, cache_dir=None, ttl=3600, max_size=100 * 2**20, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_dir = cache_dir if cache_dir else utility.get_data_dir() / 'http_cache'
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+        self.__index = OrderedDict()
+        index_file = self.cache_dir / 'index.jsonl'
+        if index_file.exists():
+            with open(index_file) as f:
+                for line in f:
+                    try:
+                        url, entry = json.loads(line)
+                    except json.JSONDecodeError:        # a line torn by a crash - the end of the log
+                        break
+                    self.__index.pop(url, None)
+                    if entry:
+                        self.__index[url] = entry
+        self.__size = sum(entry['size'] for entry in self.__index.values())
+        self.__log = None
+        self.save_index()
+
+    def get(self, url, **kwargs):
+        with self.__lock:
+            entry = self.__index.get(url)
+            if entry:
+                self.__index.move_to_end(url)
+                if time.time() - entry['stored'] < self.ttl:
+                    response = self.cached_response(url, entry)
+                    if response:
+                        self.hits += 1
+                        return response
+                    entry = None
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        conditional_headers = dict(headers)
+        if entry and 'ETag' in entry['headers']:
+            conditional_headers['If-None-Match'] = entry['headers']['ETag']
+        if entry and 'Last-Modified' in entry['headers']:
+            conditional_headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        response = super().get(url, headers=conditional_headers, **kwargs)
+
+        if entry and response.status_code == 304:
+            with self.__lock:
+                cached = self.cached_response(url, entry) if self.__index.get(url) is entry else None
+                if cached:
+                    self.revalidations += 1
+                    entry['stored'] = time.time()
+                    self.log(url, entry)
+                    return cached
+            # The entry has been removed while the request was being sent - request the page unconditionally
+            response = super().get(url, headers=headers, **kwargs)
+        with self.__lock:
+            self.misses += 1
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def body_file(self, url):
+        return self.cache_dir / sha1(url.encode('utf-8')).hexdigest()
+
+    def cached_response(self, url, entry):
+        """Returns a requests.Response object made from the cache entry for url,
+        or None if its body is no longer in the cache (the entry is then removed).
+        Must be called with the lock held, so that the body cannot be removed by store() while it is being read.
+        """
+
+        try:
+            content = self.body_file(url).read_bytes()
+        except FileNotFoundError:
+            self.remove(url)
+            return None
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response.from_cache = True
+        return response
+
+    def store(self, url, response):
+        """Saves the body of the response to the cache, removing the least recently used bodies if necessary.
+        """
+
+        headers = {k: response.headers[k] for k in ['Content-Type', 'ETag', 'Last-Modified'] if k in response.headers}
+        entry = {'headers': headers, 'stored': time.time(), 'size': len(response.content)}
+        with self.__lock:
+            self.remove(url)
+            self.body_file(url).write_bytes(response.content)
+            self.__index[url] = entry
+            self.__size += entry['size']
+            self.log(url, entry)
+            while self.__size > self.max_size and len(self.__index) > 1:
+                self.remove(next(iter(self.__index)))
+
+    def remove(self, url):
+        """Removes the entry for url and its body (if they exist); must be called with the lock held.
+        """
+
+        entry = self.__index.pop(url, None)
+        if entry:
+            self.body_file(url).unlink(missing_ok=True)
+            self.__size -= entry['size']
+            self.log(url, None)
+
+    def log(self, url, entry):
+        """Appends the new entry for url (None if it has been removed) to the index log, and compacts the log
+        if it is more than twice as long as the index; must be called with the lock held.
+        """
+
+        self.__log.write(json.dumps([url, entry]) + '\n')
+        self.__log_lines += 1
+        if self.__log_lines > 2 * len(self.__index) + 100:
+            self.save_index()
+
+    def save_index(self):
+        """Rewrites the index log with only the current entries (in the LRU order).
+        """
+
+        if self.__log:
+            self.__log.close()
+        temp_file = self.cache_dir / 'index.jsonl.tmp'
+        with open(temp_file, 'w') as f:
+            f.writelines(json.dumps([url, entry]) + '\n' for url, entry in self.__index.items())
+        temp_file.replace(self.cache_dir / 'index.jsonl')
+        self.__log = open(self.cache_dir / 'index.jsonl', 'a', buffering=1)
+        self.__log_lines = len(self.__index)
+
+    def close(self):
+        with self.__lock:
+            if not self.__log.closed:
+                self.save_index()
+                self.__log.close()
+        super().close()
+
+    def clear(self):
+        """Removes all cached responses.
+        """
+
+        with self.__lock:
+            for url in self.__index:
+                self.body_file(url).unlink(missing_ok=True)
+            self.__index.clear()
+            self.__size = 0
+            self.save_index()
+
+    def get_cache_stats(self):
+        return {'hits': self.hits, 'revalidations': self.revalidations, 'misses': self.misses,
+                'entries': len(self.__index), 'size': self.__size}
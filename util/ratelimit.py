@@ -0,0 +1,120 @@
+"""Rate limiting and retrying of HTTP requests, used by the crawler (music.crawl) to avoid being throttled or banned.
+"""
+
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import random
+import threading
+import time
+
+import requests
+
+
+class TokenBucket:
+    """Token bucket rate limiter: on average, at most rate acquire() calls per second are allowed,
+    with bursts of up to burst calls. acquire() blocks until a token is available. Thread-safe.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = burst
+        self.__last = time.monotonic()
+        self.__slowed_down = 0
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__last) * self.rate)
+            self.__last = now
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0
+        time.sleep(wait)
+
+    def slow_down(self, min_rate):
+        """Halves the rate (but not below min_rate), at most once per second,
+        so that many requests rejected at the same time count as one.
+        """
+
+        with self.__lock:
+            now = time.monotonic()
+            if now - self.__slowed_down >= 1:
+                self.rate = max(min_rate, self.rate / 2)
+                self.__slowed_down = now
+
+    def speed_up(self, step, max_rate):
+        with self.__lock:
+            self.rate = min(max_rate, self.rate + step)
+
+
+class ThrottledSession(requests.Session):
+    """requests.Session that paces the requests to each host with a TokenBucket and retries failed requests.
+    - Requests to a host are limited to rate per second (with bursts of up to burst requests).
+    - Responses with the status codes from retry_statuses (429 Too Many Requests and 5xx by default) are retried
+      up to max_retries times, after waiting for the time from the Retry-After header if the server sent it,
+      and otherwise for a random time between 0 and backoff * 2**<attempt> seconds (exponential backoff with jitter).
+      If Retry-After asks for more than max_wait seconds, the response is returned without retrying,
+      so a server (or a malformed header) cannot block the crawl for hours.
+    - The rate adapts to the server: it is halved on 429 responses (but not below min_rate),
+      and increased by 10% of the initial rate on each successful response (but not above the initial rate).
+    Can be combined with CachedSession from util.httpcache through multiple inheritance, e.g.
+        class CachedThrottledSession(CachedSession, ThrottledSession): pass
+    """
+
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate=5, burst=1, max_retries=5, backoff=0.5, min_rate=0.1, max_wait=60, **kwargs):
+        super().__init__(**kwargs)
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.min_rate = min_rate
+        self.max_wait = max_wait
+        self.retries = 0
+        self.__buckets = {}
+        self.__lock = threading.Lock()
+
+    def get_bucket(self, url):
+        host = urlsplit(url).netloc
+        with self.__lock:
+            if host not in self.__buckets:
+                self.__buckets[host] = TokenBucket(self.rate, self.burst)
+            return self.__buckets[host]
+
+    @staticmethod
+    def get_retry_after(response):
+        """Returns the number of seconds from the Retry-After header of the response
+        (given either as seconds or as an HTTP date), or None if there is no such header.
+        """
+
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is None:
+            return None
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            return max(0, (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def request(self, method, url, *args, **kwargs):
+        bucket = self.get_bucket(url)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            response = super().request(method, url, *args, **kwargs)
+            if response.status_code == 429:
+                bucket.slow_down(self.min_rate)
+            elif response.status_code < 400:
+                bucket.speed_up(self.rate / 10, self.rate)
+            if response.status_code not in self.retry_statuses or attempt == self.max_retries:
+                return response
+            retry_after = self.get_retry_after(response)
+            if retry_after is not None and retry_after > self.max_wait:
+                return response
+            response.close()
+            with self.__lock:
+                self.retries += 1
+            time.sleep(retry_after if retry_after is not None else random.uniform(0, self.backoff * 2**attempt))
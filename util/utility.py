@@ -2,6 +2,9 @@
 """
 
 from datetime import date
+import codecs
+import json
+import re
 from settings import *
 
 
@@ -32,6 +35,76 @@ def date_json_to_py(iso_date):
     return date.fromisoformat(iso_date)
 
 
+def json_stream(file, object_hook=None, chunk_size=65536, array=None):
+    """Generator that decodes JSON values from a file one at a time, without reading the entire file first.
+    The file can be any text or binary file-like object with the read() method (e.g. an open file,
+    or <socket>.makefile('rb')). It can contain either a single JSON array (as written by json.dump(<list>, f)),
+    whose items are yielded, or a sequence of JSON values separated by whitespace (e.g. one JSON value per line),
+    which are yielded as they are. array selects between the two: True for an array, False for a sequence
+    of values (which can be arrays themselves), and None to decide by the first character of the file ('[' or not);
+    with None, an array followed by anything but whitespace raises json.JSONDecodeError - use array=False
+    for a sequence of arrays. Malformed input (e.g. missing or extra commas in the array) raises json.JSONDecodeError.
+    Each item of the array (or each value in the sequence) is decoded by json.JSONDecoder.raw_decode(),
+    with the object_hook (e.g. song_json_to_py or playlist_json_to_py), and yielded as soon as it is complete,
+    so the memory used is bounded by the size of the largest item (plus chunk_size), not by the size of the file.
+    Note that each item is decoded as a whole: a single huge item (e.g. one playlist with millions of songs)
+    is read into memory entirely, so split such data into an array or a sequence of smaller items.
+    """
+
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    whitespace = re.compile(r'\s*')
+    # state: 'start', 'values' (in a sequence of values), 'first' (after '['), 'item' (after ','),
+    # 'separator' (after an array item), 'end' (after the closing ']')
+    buffer, pos, state, eof = '', 0, 'start', False
+    while True:
+        pos = whitespace.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                if state in ['start', 'values', 'end']:
+                    return
+                raise json.JSONDecodeError('Unterminated array', buffer, pos)
+        elif state == 'start':
+            if array is None:
+                array = buffer[pos] == '['
+            if not array:
+                state = 'values'
+            elif buffer[pos] == '[':
+                pos, state = pos + 1, 'first'
+            else:
+                raise json.JSONDecodeError("Expecting '['", buffer, pos)
+            continue
+        elif state == 'separator' or state == 'first' and buffer[pos] == ']':
+            if buffer[pos] not in ',]':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            state = 'item' if buffer[pos] == ',' else 'end'
+            pos += 1
+            continue
+        elif state == 'end':
+            raise json.JSONDecodeError('Extra data after the array', buffer, pos)
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A number may continue in the next chunk (e.g. '2.' + '5'), so it is complete only if it is
+                # followed by a character that cannot be part of it
+                if eof or end < len(buffer) and buffer[end] not in '0123456789.eE+-':
+                    yield value
+                    pos = end
+                    state = 'values' if state == 'values' else 'separator'
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+
+        # The next item is incomplete - read more (at least as much as is already buffered, to avoid re-decoding
+        # a large item too many times) and drop the part of the buffer that has already been decoded
+        chunk = file.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        if isinstance(chunk, bytes):
+            chunk = utf8.decode(chunk, final=eof)
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
 def get_project_dir():
     """Returns the Path object corresponding to the project root directory.
     """
@@ -66,3 +139,18 @@ if __name__ == '__main__':
     # Demonstrate get_project_dir(), get_data_dir()
     print(get_project_dir())
     print(get_data_dir())
+    print()
+
+    # Demonstrate json_stream()
+    from io import StringIO, BytesIO
+    for value in json_stream(StringIO('[{"a": 1}, [2, 3], "four", 5]'), chunk_size=4):
+        print(value)
+    for value in json_stream(BytesIO('{"Let It Be": 1970}\n{"Imagine": 1971}\n'.encode('utf-8')), chunk_size=4):
+        print(value)
+    for value in json_stream(StringIO('[1, 2]\n[3, 4]\n'), array=False):
+        print(value)
+    for malformed in ['[1, 2]\n[3, 4]\n', '[,,1,,2,]', '[1, 2', '[1 2]']:
+        try:
+            print(list(json_stream(StringIO(malformed))))
+        except json.JSONDecodeError as e:
+            print(f'{malformed!r}: {e.msg}')